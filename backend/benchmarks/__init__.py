@@ -0,0 +1,4 @@
+"""Load tests and micro-benchmarks for the order processing backend.
+
+Run from `backend/`, e.g. `python -m benchmarks.load` or `python -m benchmarks.micro`.
+"""
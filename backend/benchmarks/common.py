@@ -0,0 +1,120 @@
+import csv
+import itertools
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_PO_DIR = os.path.join(BACKEND_DIR, '..', 'onsite_documents', 'Example POs')
+
+SYNTHETIC_TYPES = ["Hex Bolt", "Hex Nut", "Flat Washer", "Lock Washer", "Lag Screw",
+                   "Carriage Bolt", "Machine Screw", "Socket Head Cap Screw"]
+SYNTHETIC_MATERIALS = ["18-8 Stainless Steel", "316 Stainless Steel", "Zinc Plated Steel", "Grade 8 Steel", "Brass"]
+SYNTHETIC_SIZES = ["#6-32", "#8-32", "#10-24", "1/4-20", "5/16-18", "3/8-16", "1/2-13"]
+SYNTHETIC_LENGTHS = ['1/2"', '3/4"', '1"', '1-1/2"', '2"', '3"']
+SYNTHETIC_COATINGS = ["Plain", "Zinc", "Black Oxide", "Hot-Dip Galvanized"]
+SYNTHETIC_THREADS = ["Coarse", "Fine"]
+SYNTHETIC_PACKS = [1, 10, 25, 50, 100]
+
+def prepare_environment(workdir: str | None = None, **settings) -> str:
+    """Point the backend at a scratch database before any backend module is imported.
+
+    Returns the working directory. Extra keyword arguments are exported as env vars.
+    """
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    workdir = os.path.abspath(workdir or tempfile.mkdtemp(prefix="po-bench-"))
+    os.makedirs(workdir, exist_ok=True)
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    for name, value in settings.items():
+        if value is not None:
+            os.environ[name] = str(value)
+    return workdir
+
+def write_synthetic_catalog(path: str, rows: int) -> str:
+    """Write a fastener catalog CSV with `rows` unique products."""
+    combos = itertools.product(SYNTHETIC_PACKS, SYNTHETIC_TYPES, SYNTHETIC_MATERIALS, SYNTHETIC_SIZES,
+                               SYNTHETIC_LENGTHS, SYNTHETIC_COATINGS, SYNTHETIC_THREADS)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Type", "Material", "Size", "Length", "Coating", "Thread Type", "Description"])
+        for pack, type_, material, size, length, coating, thread in itertools.islice(combos, rows):
+            description = f"{type_} {size} x {length} {material} {coating} {thread} Thread"
+            if pack > 1:
+                description += f" (Pack of {pack})"
+            writer.writerow([type_, material, size, length, coating, thread, description])
+    return path
+
+def read_descriptions(catalog_path: str) -> List[str]:
+    """Read product descriptions from a catalog CSV."""
+    with open(catalog_path, 'r', newline='') as f:
+        return [row['Description'] for row in csv.DictReader(f)]
+
+def sample_pos() -> List[str]:
+    """Paths of the example purchase orders shipped in onsite_documents."""
+    if not os.path.isdir(SAMPLE_PO_DIR):
+        return []
+    return sorted(
+        os.path.join(SAMPLE_PO_DIR, name) for name in os.listdir(SAMPLE_PO_DIR)
+        if name.lower().endswith('.pdf')
+    )
+
+def free_port() -> int:
+    """Ask the OS for an unused local TCP port."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(app, port: int):
+    """Run an ASGI app with uvicorn in a background thread and wait until it accepts requests."""
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"Server on port {port} failed to start")
+        time.sleep(0.01)
+    return server, thread
+
+def percentile(values: List[float], q: float) -> float | None:
+    """Nearest-rank percentile of `values` (q in 0-100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(round(q / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+class QueryCounter:
+    """Count SQL statements executed on an engine."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self.count += 1
+
+    def __enter__(self):
+        from sqlalchemy import event
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+def format_table(rows: List[Dict], columns: List[str]) -> str:
+    """Render dict rows as a fixed-width text table."""
+    cells = [[str(row.get(c, "")) for c in columns] for row in rows]
+    widths = [max([len(c)] + [len(r[i]) for r in cells]) for i, c in enumerate(columns)]
+    lines = ["  ".join(c.ljust(w) for c, w in zip(columns, widths))]
+    lines.append("  ".join("-" * w for w in widths))
+    lines.extend("  ".join(v.ljust(w) for v, w in zip(r, widths)) for r in cells)
+    return "\n".join(lines)
@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import random
+from dataclasses import dataclass
+from typing import Dict, List
+from fastapi import Body, FastAPI, File, Query, UploadFile
+from benchmarks import common
+
+@dataclass
+class FakeServiceSettings:
+    """Latency and payload tunables for the fake APIs."""
+    extraction_latency: float = 0.5
+    matching_latency: float = 0.1
+    matching_latency_per_item: float = 0.002
+    jitter: float = 0.2
+    items_per_po: int = 40
+    unique_ratio: float = 0.8
+    seed: int = 0
+
+def _sleep_for(base: float, jitter: float) -> float:
+    return max(base * (1 + random.uniform(-jitter, jitter)), 0.0)
+
+def create_app(descriptions: List[str], settings: FakeServiceSettings) -> FastAPI:
+    """Serve /extraction_api and /match/batch from a list of catalog descriptions."""
+    app = FastAPI()
+    rng = random.Random(settings.seed)
+    by_key = {" ".join(d.lower().split()): d for d in descriptions}
+
+    @app.post("/extraction_api")
+    async def extract(file: UploadFile = File(...)) -> List[Dict]:
+        await file.read()
+        await asyncio.sleep(_sleep_for(settings.extraction_latency, settings.jitter))
+        unique = max(int(settings.items_per_po * settings.unique_ratio), 1)
+        picks = rng.sample(descriptions, min(unique, len(descriptions)))
+        items = []
+        for i in range(settings.items_per_po):
+            # Repeat some lines and vary their case, like real POs do
+            text = picks[i % len(picks)]
+            items.append({"Request Item": text.upper() if i % 3 == 0 else text, "Amount": rng.randint(1, 500)})
+        return items
+
+    @app.post("/match/batch")
+    async def match(payload: Dict = Body(...), limit: int = Query(5)) -> Dict:
+        queries = payload.get("queries", [])
+        latency = settings.matching_latency + settings.matching_latency_per_item * len(queries)
+        await asyncio.sleep(_sleep_for(latency, settings.jitter))
+        results = {}
+        for q in queries:
+            best = by_key.get(" ".join(q.lower().split())) or rng.choice(descriptions)
+            others = rng.sample(descriptions, min(limit - 1, len(descriptions))) if limit > 1 else []
+            score = rng.uniform(60, 99)
+            results[q] = [{"match": best, "score": round(score, 2)}] + [
+                {"match": d, "score": round(score * rng.uniform(0.3, 0.9), 2)} for d in others
+            ]
+        return {"results": results}
+
+    return app
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Register the fake service tunables on a command line parser."""
+    defaults = FakeServiceSettings()
+    parser.add_argument("--extraction-latency", type=float, default=defaults.extraction_latency,
+                        help="seconds per extraction call")
+    parser.add_argument("--matching-latency", type=float, default=defaults.matching_latency,
+                        help="base seconds per /match/batch call")
+    parser.add_argument("--matching-latency-per-item", type=float, default=defaults.matching_latency_per_item,
+                        help="extra seconds per query in a /match/batch call")
+    parser.add_argument("--jitter", type=float, default=defaults.jitter,
+                        help="relative random variation applied to every latency")
+    parser.add_argument("--items-per-po", type=int, default=defaults.items_per_po,
+                        help="line items returned per extracted PO")
+    parser.add_argument("--unique-ratio", type=float, default=defaults.unique_ratio,
+                        help="fraction of a PO's line items with distinct text")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+def settings_from_args(args) -> FakeServiceSettings:
+    """Build settings from arguments registered by add_arguments."""
+    return FakeServiceSettings(
+        extraction_latency=args.extraction_latency,
+        matching_latency=args.matching_latency,
+        matching_latency_per_item=args.matching_latency_per_item,
+        jitter=args.jitter,
+        items_per_po=args.items_per_po,
+        unique_ratio=args.unique_ratio,
+        seed=args.seed,
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run fake extraction and matching APIs for local testing.")
+    parser.add_argument("--catalog", required=True, help="catalog CSV the fake APIs draw descriptions from")
+    parser.add_argument("--port", type=int, default=8100)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    import uvicorn
+    app = create_app(common.read_descriptions(args.catalog), settings_from_args(args))
+    print(f"Set EXTRACTION_API_URL and MATCHING_API_URL to http://127.0.0.1:{args.port}")
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
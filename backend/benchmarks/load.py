@@ -0,0 +1,170 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict
+from benchmarks import common, fake_services
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Drive concurrent PO uploads through the app against fake extraction and matching APIs."
+    )
+    parser.add_argument("--orders", type=int, default=50, help="number of POs to upload")
+    parser.add_argument("--concurrency", type=int, default=10, help="uploads in flight at once")
+    parser.add_argument("--workers", type=int, default=4, help="JOB_WORKERS for the run")
+    parser.add_argument("--catalog", help="catalog CSV to load (default: a synthetic catalog)")
+    parser.add_argument("--catalog-rows", type=int, default=10000, help="size of the synthetic catalog")
+    parser.add_argument("--with-caches", action="store_true",
+                        help="keep the extraction and match caches enabled (off by default)")
+    parser.add_argument("--workdir", help="scratch directory for the database and uploads")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for all jobs to finish")
+    parser.add_argument("--json", dest="json_path", help="also write the results to this JSON file")
+    parser.add_argument("--log-level", default="WARNING", help="backend LOG_LEVEL during the run")
+    fake_services.add_arguments(parser)
+    return parser.parse_args()
+
+async def run(args, app_module, pdfs):
+    import httpx
+    from database import SessionLocal, engine
+    from models import Job
+    from sqlalchemy import func, select
+
+    counter = common.QueryCounter(engine)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    upload_seconds = []
+    failed_uploads = 0
+
+    async def upload(client, i):
+        nonlocal failed_uploads
+        path = pdfs[i % len(pdfs)]
+        name = f"bench-{i:05d}-{os.path.basename(path)}"
+        with open(path, 'rb') as f:
+            content = f.read()
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/upload", files={"file": (name, content, "application/pdf")})
+            upload_seconds.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            failed_uploads += 1
+
+    async with app_module.lifespan(app_module.app):
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            with counter:
+                start = time.perf_counter()
+                await asyncio.gather(*(upload(client, i) for i in range(args.orders)))
+
+                # Wait for the queue to drain
+                deadline = start + args.timeout
+                while True:
+                    with SessionLocal() as db:
+                        counts = dict(db.execute(select(Job.status, func.count(Job.id)).group_by(Job.status)).all())
+                    if counts.get('queued', 0) + counts.get('running', 0) == 0 or time.perf_counter() > deadline:
+                        break
+                    await asyncio.sleep(0.05)
+                elapsed = time.perf_counter() - start
+
+    return {
+        "elapsed": elapsed,
+        "counts": counts,
+        "failed_uploads": failed_uploads,
+        "upload_seconds": upload_seconds,
+        "queries": counter.count,
+    }
+
+def main():
+    args = parse_args()
+    workdir = common.prepare_environment(
+        args.workdir,
+        JOB_WORKERS=args.workers,
+        MATCHING_MODE="remote",
+        # The sample POs have a text layer, so local_first would skip the fake extraction service
+        EXTRACTION_MODE="remote",
+        LOG_LEVEL=args.log_level,
+        EXTRACTION_CACHE_ENABLED=None if args.with_caches else "false",
+        MATCH_CACHE_ENABLED=None if args.with_caches else "false",
+    )
+    json_path = os.path.abspath(args.json_path) if args.json_path else None
+    catalog_path = os.path.abspath(args.catalog) if args.catalog else common.write_synthetic_catalog(
+        os.path.join(workdir, "catalog.csv"), args.catalog_rows
+    )
+    port = common.free_port()
+    os.environ["PRODUCT_CATALOG_PATH"] = catalog_path
+    os.environ["EXTRACTION_API_URL"] = f"http://127.0.0.1:{port}"
+    os.environ["MATCHING_API_URL"] = f"http://127.0.0.1:{port}"
+
+    pdfs = common.sample_pos()
+    if not pdfs:
+        raise SystemExit(f"No sample POs found in {common.SAMPLE_PO_DIR}")
+
+    # Backend modules read their configuration on import; uploads land in the scratch directory
+    os.chdir(workdir)
+    import init_db
+    import main as app_module
+    import metrics
+
+    init_db.init_db()
+    init_db.load_product_catalog()
+
+    # Keep raw stage timings for percentiles alongside the histogram buckets
+    samples = defaultdict(list)
+    observe = metrics.STAGE_SECONDS.observe
+
+    def record(value, **labels):
+        samples[labels.get("stage")].append(value)
+        observe(value, **labels)
+
+    metrics.STAGE_SECONDS.observe = record
+    job_observe = metrics.JOB_SECONDS.observe
+
+    def record_job(value, **labels):
+        samples["job"].append(value)
+        job_observe(value, **labels)
+
+    metrics.JOB_SECONDS.observe = record_job
+
+    fake_app = fake_services.create_app(common.read_descriptions(catalog_path), fake_services.settings_from_args(args))
+    server, thread = common.start_server(fake_app, port)
+    try:
+        result = asyncio.run(run(args, app_module, pdfs))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+    done = result["counts"].get("done", 0)
+    stages = []
+    for stage in ["upload", "upload_write", "extraction", "matching", "product_resolution", "db_commit", "job"]:
+        values = result["upload_seconds"] if stage == "upload" else samples.get(stage, [])
+        if not values:
+            continue
+        stages.append({
+            "stage": stage,
+            "count": len(values),
+            "p50_ms": round(common.percentile(values, 50) * 1000, 1),
+            "p99_ms": round(common.percentile(values, 99) * 1000, 1),
+            "total_s": round(sum(values), 2),
+        })
+
+    summary = {
+        "orders": args.orders,
+        "done": done,
+        "failed": result["counts"].get("failed", 0),
+        "unfinished": result["counts"].get("queued", 0) + result["counts"].get("running", 0),
+        "failed_uploads": result["failed_uploads"],
+        "elapsed_s": round(result["elapsed"], 2),
+        "orders_per_s": round(done / result["elapsed"], 2) if result["elapsed"] else None,
+        "db_queries": result["queries"],
+        "db_queries_per_order": round(result["queries"] / max(args.orders, 1), 1),
+        "stages": stages,
+    }
+
+    print(common.format_table([{k: v for k, v in summary.items() if k != "stages"}], [k for k in summary if k != "stages"]))
+    print()
+    print(common.format_table(stages, ["stage", "count", "p50_ms", "p99_ms", "total_s"]))
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict
+from benchmarks import common
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Time catalog loading, local matching, product search and order export, optionally against a saved baseline."
+    )
+    parser.add_argument("--catalog", help="catalog CSV to load (default: a synthetic catalog)")
+    parser.add_argument("--catalog-rows", type=int, default=20000, help="size of the synthetic catalog")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark")
+    parser.add_argument("--match-queries", type=int, default=40, help="line items matched by the local matcher")
+    parser.add_argument("--export-items", type=int, default=5000, help="line items in the exported order")
+    parser.add_argument("--workdir", help="scratch directory for the database")
+    parser.add_argument("--output", help="write results to this JSON file (e.g. to use as a baseline)")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown of the median versus the baseline before failing")
+    return parser.parse_args()
+
+def measure(fn: Callable[[], object], repeat: int, setup: Callable[[], object] | None = None) -> Dict:
+    """Run fn `repeat` times after one untimed warm-up, returning median and min seconds."""
+    timings = []
+    for i in range(repeat + 1):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        if i > 0:
+            timings.append(time.perf_counter() - start)
+    return {"median": statistics.median(timings), "min": min(timings), "runs": repeat}
+
+def main():
+    args = parse_args()
+    workdir = common.prepare_environment(args.workdir, JOB_WORKERS=0, MATCHING_MODE="remote", LOG_LEVEL="WARNING")
+    output_path = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    catalog_path = os.path.abspath(args.catalog) if args.catalog else common.write_synthetic_catalog(
+        os.path.join(workdir, "catalog.csv"), args.catalog_rows
+    )
+    os.environ["PRODUCT_CATALOG_PATH"] = catalog_path
+
+    # Backend modules read their configuration on import
+    os.chdir(workdir)
+    import logging
+    from fastapi.testclient import TestClient
+    import init_db
+    import main as app_module
+    import matching
+    from database import SessionLocal
+    from models import LineItem, Order
+    from sqlalchemy import insert
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = {}
+    results["load_product_catalog"] = measure(init_db.load_product_catalog, args.repeat, setup=init_db.init_db)
+    init_db.init_db()
+    init_db.load_product_catalog()
+
+    descriptions = common.read_descriptions(catalog_path)
+    queries = [" ".join(d.split()[:n]) for d in descriptions[::max(len(descriptions) // 20, 1)][:20] for n in (1, 3)]
+    # Search-as-you-type: first keystrokes, where a prefix matches most of the catalog, and partial
+    # words in any order (e.g. "1/4 he")
+    prefix_queries = []
+    for d in descriptions[::max(len(descriptions) // 5, 1)][:5]:
+        words = d.lower().split()
+        prefix_queries += [d[:1], d[:2], d[:3], f"{words[-1][:3]} {words[0][:2]}"]
+
+    # PO-style line items: catalog descriptions with some words left out
+    rng = random.Random(0)
+    match_queries = [
+        " ".join(word for word in d.split() if rng.random() > 0.2)
+        for d in rng.sample(descriptions, min(args.match_queries, len(descriptions)))
+    ]
+    matcher = matching.ProductMatcher(descriptions)
+    results["local_matching"] = measure(lambda: matcher.match_batch(match_queries), args.repeat)
+    results["local_matching"]["queries"] = len(match_queries)
+
+    with SessionLocal() as db:
+        order = Order(filename="benchmark-export.pdf", status="needs_review")
+        db.add(order)
+        db.commit()
+        order_id = order.id
+        db.execute(insert(LineItem), [
+            {
+                "order_id": order_id,
+                "extracted_text": descriptions[i % len(descriptions)],
+                "matched_product_id": (i % len(descriptions)) + 1,
+                "confidence_score": 90.0,
+                "quantity": i % 50 + 1,
+            }
+            for i in range(args.export_items)
+        ])
+        db.commit()
+
+    with TestClient(app_module.app) as client:
+        def search(queries):
+            for q in queries:
+                response = client.get("/products/search", params={"q": q, "limit": 10})
+                response.raise_for_status()
+
+        def export():
+            with client.stream("GET", f"/orders/{order_id}/export") as response:
+                response.raise_for_status()
+                for _ in response.iter_bytes():
+                    pass
+
+        results["products_search"] = measure(lambda: search(queries), args.repeat)
+        results["products_search"]["queries"] = len(queries)
+        results["products_search_prefix"] = measure(lambda: search(prefix_queries), args.repeat)
+        results["products_search_prefix"]["queries"] = len(prefix_queries)
+        results["export_order"] = measure(export, args.repeat)
+        results["export_order"]["line_items"] = args.export_items
+
+    rows = [
+        {"benchmark": name, "median_ms": round(r["median"] * 1000, 1), "min_ms": round(r["min"] * 1000, 1)}
+        for name, r in results.items()
+    ]
+
+    regressions = []
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        for row in rows:
+            base = baseline.get(row["benchmark"])
+            if not base:
+                continue
+            ratio = results[row["benchmark"]]["median"] / base["median"]
+            row["vs_baseline"] = f"{ratio:.2f}x"
+            if ratio > 1 + args.tolerance:
+                regressions.append(row["benchmark"])
+
+    print(common.format_table(rows, ["benchmark", "median_ms", "min_ms"] + (["vs_baseline"] if baseline_path else [])))
+    if output_path:
+        with open(output_path, 'w') as f:
+            json.dump(results, f, indent=2)
+    if regressions:
+        print(f"Slower than baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
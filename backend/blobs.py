@@ -0,0 +1,126 @@
+import gzip
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import BinaryIO, Dict, Iterable
+import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Uploaded PDFs are stored once per content, named by SHA-256 under a two-character fan-out directory
+BLOB_DIR = "blobs"
+COMPRESSED_SUFFIX = ".pdf.gz"
+PLAIN_SUFFIX = ".pdf"
+
+def blob_root() -> str:
+    """Directory holding the content-addressed uploads."""
+    return os.path.join(config.UPLOAD_DIR, BLOB_DIR)
+
+def blob_paths(content_hash: str) -> tuple:
+    """Return the uncompressed and compressed locations a blob can be stored at."""
+    base = os.path.join(blob_root(), content_hash[:2], content_hash)
+    return base + PLAIN_SUFFIX, base + COMPRESSED_SUFFIX
+
+def find(content_hash: str) -> str | None:
+    """Return the path of the stored blob for this content hash, if any."""
+    for path in blob_paths(content_hash):
+        if os.path.exists(path):
+            return path
+    return None
+
+def store(source_path: str, content_hash: str) -> tuple:
+    """Move a fully written upload into the blob store, returning (path, whether it was already stored).
+
+    The source file is consumed either way; content that is already stored is not written again.
+    """
+    existing = find(content_hash)
+    if existing:
+        os.remove(source_path)
+        # Refresh the timestamp so garbage collection treats the blob as recently used
+        os.utime(existing)
+        return existing, True
+
+    plain_path, compressed_path = blob_paths(content_hash)
+    os.makedirs(os.path.dirname(plain_path), exist_ok=True)
+    if not config.UPLOAD_COMPRESSION:
+        os.replace(source_path, plain_path)
+        return plain_path, False
+
+    fd, partial_path = tempfile.mkstemp(suffix=".part", dir=os.path.dirname(compressed_path))
+    try:
+        with open(source_path, 'rb') as src, open(fd, 'wb') as raw, \
+                gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=config.UPLOAD_COMPRESSION_LEVEL) as dst:
+            shutil.copyfileobj(src, dst, config.UPLOAD_CHUNK_SIZE)
+        os.replace(partial_path, compressed_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    os.remove(source_path)
+    return compressed_path, False
+
+def open_blob(path: str) -> BinaryIO:
+    """Open a stored PDF for reading, decompressing it if needed."""
+    if path.endswith(COMPRESSED_SUFFIX):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+def read_blob(path: str) -> bytes:
+    """Read a stored PDF's original bytes."""
+    with open_blob(path) as f:
+        return f.read()
+
+def iter_blobs() -> Iterable[tuple]:
+    """Yield (content hash, path) for every stored blob."""
+    root = blob_root()
+    if not os.path.isdir(root):
+        return
+    for prefix in os.listdir(root):
+        directory = os.path.join(root, prefix)
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            for suffix in (COMPRESSED_SUFFIX, PLAIN_SUFFIX):
+                if name.endswith(suffix):
+                    yield name[:-len(suffix)], os.path.join(directory, name)
+                    break
+
+def collect_garbage(referenced: set, grace_seconds: float) -> Dict:
+    """Delete blobs no longer referenced, sparing ones written within the grace period (uploads in flight)."""
+    cutoff = time.time() - grace_seconds
+    removed = freed = kept = 0
+    for content_hash, path in iter_blobs():
+        if content_hash in referenced:
+            kept += 1
+            continue
+        try:
+            stat = os.stat(path)
+            if stat.st_mtime > cutoff:
+                kept += 1
+                continue
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        removed += 1
+        freed += stat.st_size
+    if removed:
+        logger.info(f"Removed {removed} unreferenced uploads ({freed} bytes)")
+    return {"removed": removed, "freed_bytes": freed, "kept": kept}
+
+def usage() -> Dict:
+    """Count stored blobs and their size on disk."""
+    count = size = 0
+    for _, path in iter_blobs():
+        try:
+            size += os.path.getsize(path)
+        except FileNotFoundError:
+            continue
+        count += 1
+    return {"blobs": count, "bytes": size}
+
+def clear():
+    """Delete every stored blob."""
+    shutil.rmtree(blob_root(), ignore_errors=True)
@@ -0,0 +1,95 @@
+import logging
+import threading
+from typing import Dict, Iterable, Set
+from database import SessionLocal
+from models import Product
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+import config
+import facets
+import match_cache
+import matching
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# SQLite caps the number of bound parameters per statement
+IN_CLAUSE_CHUNK_SIZE = 500
+
+# Product description -> product id
+_product_ids: Dict[str, int] = {}
+# Every product id, valid while the cache is warm
+_known_ids: Set[int] = set()
+_warm = False
+_lock = threading.Lock()
+# Bumped whenever the caches are invalidated, so reads made before a catalog reload are discarded
+_generation = 0
+
+def warm_product_ids():
+    """Load the full description -> product id map from the catalog."""
+    global _product_ids, _known_ids, _warm
+    generation = _generation
+    with SessionLocal() as db:
+        rows = db.execute(select(Product.description, Product.id)).all()
+    with _lock:
+        if generation != _generation:
+            logger.info("Discarded product ids read before the catalog was reloaded")
+            return
+        _product_ids = dict(rows)
+        _known_ids = set(_product_ids.values())
+        _warm = True
+    logger.info(f"Cached product ids for {len(rows)} descriptions")
+
+def resolve_product_ids(db: Session, descriptions: Iterable[str]) -> Dict[str, int]:
+    """Map product descriptions to product ids, querying the database only for uncached ones."""
+    wanted = {d for d in descriptions if d}
+    found = {d: _product_ids[d] for d in wanted if d in _product_ids}
+    missing = list(wanted - found.keys())
+
+    # A warm cache holds the whole catalog, so anything missing isn't a product
+    if missing and not _warm:
+        generation = _generation
+        for i in range(0, len(missing), IN_CLAUSE_CHUNK_SIZE):
+            chunk = missing[i:i + IN_CLAUSE_CHUNK_SIZE]
+            rows = db.execute(
+                select(Product.description, Product.id).where(Product.description.in_(chunk))
+            ).all()
+            found.update(rows)
+        with _lock:
+            if generation == _generation:
+                _product_ids.update((d, found[d]) for d in missing if d in found)
+
+    return found
+
+def existing_product_ids(db: Session, product_ids: Iterable[int]) -> Set[int]:
+    """Return the subset of product ids that exist, checking the cached id set when it is warm."""
+    wanted = set(product_ids)
+    if _warm:
+        return wanted & _known_ids
+    
+    found = set()
+    wanted = list(wanted)
+    for i in range(0, len(wanted), IN_CLAUSE_CHUNK_SIZE):
+        chunk = wanted[i:i + IN_CLAUSE_CHUNK_SIZE]
+        found.update(db.execute(select(Product.id).where(Product.id.in_(chunk))).scalars())
+    return found
+
+def invalidate_catalog_caches():
+    """Drop every in-memory view of the product catalog after it is reloaded."""
+    global _product_ids, _known_ids, _warm, _generation
+    with _lock:
+        _product_ids = {}
+        _known_ids = set()
+        _warm = False
+        _generation += 1
+    matching.invalidate_index()
+    facets.invalidate_index()
+    match_cache.clear()
+
+def warm_catalog_caches():
+    """Rebuild the in-memory views of the product catalog used while processing orders."""
+    warm_product_ids()
+    facets.build_index()
+    if config.MATCHING_MODE != "remote":
+        matching.build_index()
@@ -0,0 +1,88 @@
+import os
+
+# Upstream services
+EXTRACTION_API_URL = os.getenv("EXTRACTION_API_URL", "https://plankton-app-qajlk.ondigitalocean.app").rstrip("/")
+MATCHING_API_URL = os.getenv("MATCHING_API_URL", "https://endeavor-interview-api-gzwki.ondigitalocean.app").rstrip("/")
+
+# PDF extraction: 'remote' (extraction API), 'local' (embedded text layer, needs 'pypdf')
+# or 'local_first' (text layer, extraction API for scanned or unrecognized layouts)
+EXTRACTION_MODE = os.getenv("EXTRACTION_MODE", "local_first")
+LOCAL_EXTRACTION_MIN_CONFIDENCE = float(os.getenv("LOCAL_EXTRACTION_MIN_CONFIDENCE", "0.9"))
+LOCAL_EXTRACTION_PROCESSES = int(os.getenv("LOCAL_EXTRACTION_PROCESSES", "2"))
+
+# Product matching: 'remote' (matching API), 'local' (in-process index)
+# or 'local_first' (local index, remote API for low-confidence items)
+MATCHING_MODE = os.getenv("MATCHING_MODE", "remote")
+MATCH_LIMIT = int(os.getenv("MATCH_LIMIT", "5"))
+LOCAL_MATCH_MIN_SCORE = float(os.getenv("LOCAL_MATCH_MIN_SCORE", "30"))
+# Large POs are matched in chunks of MATCH_CHUNK_SIZE items, MATCH_FANOUT chunks at a time
+MATCH_CHUNK_SIZE = int(os.getenv("MATCH_CHUNK_SIZE", "50"))
+MATCH_FANOUT = int(os.getenv("MATCH_FANOUT", "4"))
+
+# Shared HTTP client for the extraction and matching APIs
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2 = os.getenv("HTTP2", "false").lower() in ("1", "true", "yes")
+EXTRACTION_TIMEOUT = float(os.getenv("EXTRACTION_TIMEOUT", "60"))
+MATCHING_TIMEOUT = float(os.getenv("MATCHING_TIMEOUT", "30"))
+UPSTREAM_CONCURRENCY = int(os.getenv("UPSTREAM_CONCURRENCY", "8"))
+
+# Extraction results cached by PDF content hash
+EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# Match results cached by normalized line-item text
+MATCH_CACHE_ENABLED = os.getenv("MATCH_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+MATCH_CACHE_MAX_ENTRIES = int(os.getenv("MATCH_CACHE_MAX_ENTRIES", "10000"))
+MATCH_CACHE_TTL = float(os.getenv("MATCH_CACHE_TTL", "3600"))
+
+# Product catalog loading
+PRODUCT_CATALOG_PATH = os.getenv("PRODUCT_CATALOG_PATH", os.path.join('..', 'onsite_documents', 'unique_fastener_catalog.csv'))
+CATALOG_BATCH_SIZE = int(os.getenv("CATALOG_BATCH_SIZE", "5000"))
+
+# PO processing job queue
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_WORKER_MODE = os.getenv("JOB_WORKER_MODE", "async")  # 'async' or 'process'
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "5"))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "1000"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "30"))
+
+# Database
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///db/orders.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+
+# Line item review
+LINE_ITEM_BATCH_MAX = int(os.getenv("LINE_ITEM_BATCH_MAX", "1000"))
+
+# CSV exports
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+# Uploads, stored once per content hash and optionally gzip-compressed
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_COMPRESSION = os.getenv("UPLOAD_COMPRESSION", "false").lower() in ("1", "true", "yes")
+UPLOAD_COMPRESSION_LEVEL = int(os.getenv("UPLOAD_COMPRESSION_LEVEL", "6"))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+# Retention: completed orders untouched for RETENTION_DAYS are moved to the archive (0 disables it)
+RETENTION_DAYS = float(os.getenv("RETENTION_DAYS", "0"))
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "3600"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "200"))
+# Unreferenced uploads younger than this are kept, as their order may still be being created
+UPLOAD_GC_GRACE = float(os.getenv("UPLOAD_GC_GRACE", "3600"))
+
+# Order event stream (Server-Sent Events)
+EVENTS_HISTORY = int(os.getenv("EVENTS_HISTORY", "1000"))
+EVENTS_QUEUE_MAX = int(os.getenv("EVENTS_QUEUE_MAX", "1000"))
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+EVENTS_RETRY_MS = int(os.getenv("EVENTS_RETRY_MS", "3000"))
+
+# Logging: set LOG_LEVEL=DEBUG to log full upstream responses, or sample a fraction of them at INFO
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+RESPONSE_LOG_SAMPLE_RATE = float(os.getenv("RESPONSE_LOG_SAMPLE_RATE", "0"))
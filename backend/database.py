@@ -1,13 +1,32 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
 import os
-
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sql_app.db"
+import config
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    config.DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=config.DB_POOL_SIZE,
+    max_overflow=config.DB_MAX_OVERFLOW,
+    pool_timeout=config.DB_POOL_TIMEOUT,
 )
+
+@event.listens_for(engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Let readers proceed while orders are being written, and wait for locks instead of failing."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode = WAL")
+    cursor.execute("PRAGMA synchronous = NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout = {config.DB_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+def ensure_database_directory():
+    """Create the SQLite database's directory if it doesn't exist yet."""
+    if config.DATABASE_URL.startswith("sqlite:///"):
+        db_dir = os.path.dirname(config.DATABASE_URL[len("sqlite:///"):])
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Dependency
@@ -17,7 +36,3 @@ def get_db():
         yield db
     finally:
         db.close()
-
-# Create uploads directory
-UPLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads")
-os.makedirs(UPLOAD_DIR, exist_ok=True) 
\ No newline at end of file
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Dict
+from models import Order
+import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_history = deque(maxlen=config.EVENTS_HISTORY)
+_subscribers = set()
+_lock = threading.Lock()
+_last_id = 0
+# Event ids are prefixed with the server start time so ids from a previous run are never replayed
+_epoch = format(int(time.time()), "x")
+
+class Subscription:
+    """Queue of events waiting to be sent to one stream, optionally limited to one order."""
+
+    def __init__(self, order_id: int | None):
+        self.order_id = order_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=config.EVENTS_QUEUE_MAX)
+
+    def wants(self, event: Dict) -> bool:
+        return self.order_id is None or event["order_id"] in (None, self.order_id)
+
+    def deliver(self, event: Dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Close a stream that can't keep up; the client resumes from its last event id
+            logger.warning("Event subscriber fell behind, closing its stream")
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+def publish(event_type: str, order_id: int | None, data: Dict) -> int:
+    """Record an event and push it to matching subscribers; safe to call from any thread."""
+    global _last_id
+    with _lock:
+        _last_id += 1
+        event = {"id": _last_id, "type": event_type, "order_id": order_id, "data": data}
+        _history.append(event)
+        subscribers = [s for s in _subscribers if s.wants(event)]
+
+    for subscription in subscribers:
+        try:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+        except RuntimeError:
+            # The subscriber's event loop has shut down
+            pass
+    return event["id"]
+
+def order_to_dict(order: Order) -> Dict:
+    """Serialize an order the same way the order endpoints do."""
+    return {
+        "id": order.id,
+        "filename": order.filename,
+        "status": order.status,
+        "created_at": order.created_at.isoformat(),
+        "updated_at": order.updated_at.isoformat()
+    }
+
+def publish_order(order: Order) -> int:
+    """Publish an order's current state."""
+    return publish("order", order.id, order_to_dict(order))
+
+def parse_event_id(event_id: str | None) -> int | None:
+    """Return the sequence number of an event id issued by this server run, or -1 for any other id."""
+    if not event_id:
+        return None
+    epoch, _, sequence = event_id.partition("-")
+    if epoch != _epoch or not sequence.isdigit():
+        return -1
+    return int(sequence)
+
+def subscribe(order_id: int | None = None, last_event_id: str | None = None) -> tuple:
+    """Register a subscriber and return it with the events it missed since last_event_id.
+
+    `reset` is True when those events are no longer available (or came from a previous
+    server run), in which case the client should reload its state instead of replaying.
+    """
+    subscription = Subscription(order_id)
+    last_sequence = parse_event_id(last_event_id)
+    with _lock:
+        _subscribers.add(subscription)
+        missed = []
+        reset = False
+        if last_sequence is not None:
+            oldest = _history[0]["id"] if _history else _last_id + 1
+            reset = last_sequence < 0 or last_sequence > _last_id or last_sequence + 1 < oldest
+            if not reset:
+                missed = [e for e in _history if e["id"] > last_sequence and subscription.wants(e)]
+        current_id = _last_id
+    return subscription, missed, reset, current_id
+
+def unsubscribe(subscription: Subscription):
+    """Stop delivering events to a subscriber."""
+    with _lock:
+        _subscribers.discard(subscription)
+
+def format_event(event_id: int, event_type: str, data: Dict) -> str:
+    """Encode an event in the Server-Sent Events wire format."""
+    return f"id: {_epoch}-{event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+async def stream(order_id: int | None = None, last_event_id: str | None = None) -> AsyncIterator[str]:
+    """Yield missed and then live events as SSE text until the client disconnects."""
+    subscription, missed, reset, current_id = subscribe(order_id, last_event_id)
+    try:
+        yield f"retry: {config.EVENTS_RETRY_MS}\n\n"
+        if reset:
+            yield format_event(current_id, "reset", {})
+        for event in missed:
+            yield format_event(event["id"], event["type"], event["data"])
+
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=config.EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                break
+            yield format_event(event["id"], event["type"], event["data"])
+    finally:
+        unsubscribe(subscription)
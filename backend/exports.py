@@ -0,0 +1,144 @@
+import csv
+import io
+import logging
+import re
+import zipfile
+from typing import Iterator, List
+from database import SessionLocal
+from models import Order, LineItem, Product
+from sqlalchemy import select
+import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = [
+    "Line Item ID", "Extracted Text", "Matched Product ID",
+    "Product Description", "Product Type", "Material",
+    "Size", "Length", "Coating", "Thread Type",
+    "Quantity", "Confidence Score"
+]
+BULK_EXPORT_COLUMNS = ["Order ID", "Order Filename", "Order Status"] + EXPORT_COLUMNS
+
+def export_query():
+    """Select orders' line items joined to their matched products, in export column order."""
+    return (
+        select(
+            Order.id, Order.filename, Order.status,
+            LineItem.id, LineItem.extracted_text, LineItem.matched_product_id,
+            Product.description, Product.type, Product.material,
+            Product.size, Product.length, Product.coating, Product.thread_type,
+            LineItem.quantity, LineItem.confidence_score
+        )
+        .join(LineItem, LineItem.order_id == Order.id)
+        .outerjoin(Product, Product.id == LineItem.matched_product_id)
+        .order_by(Order.id, LineItem.id)
+    )
+
+def format_line_item(row) -> list:
+    """Turn an export_query row into the per-line-item CSV fields."""
+    (item_id, extracted_text, matched_product_id, description, product_type, material,
+     size, length, coating, thread_type, quantity, confidence_score) = row[3:]
+    return [
+        item_id,
+        extracted_text,
+        matched_product_id or "",
+        description or "",
+        product_type or "",
+        material or "",
+        size or "",
+        length or "",
+        coating or "",
+        thread_type or "",
+        quantity,
+        f"{confidence_score:.2f}"
+    ]
+
+class _CsvBuffer:
+    """Collect CSV rows in a small buffer that is drained after every chunk."""
+
+    def __init__(self):
+        self.output = io.StringIO()
+        self.writer = csv.writer(self.output)
+
+    def drain(self) -> str:
+        data = self.output.getvalue()
+        self.output.seek(0)
+        self.output.truncate()
+        return data
+
+def _partitions(db, stmt):
+    """Fetch rows in chunks instead of loading the whole result."""
+    return db.execute(stmt.execution_options(yield_per=config.EXPORT_CHUNK_SIZE)).partitions()
+
+def stream_order_csv(order_id: int) -> Iterator[str]:
+    """Stream one order's line items as CSV text."""
+    buffer = _CsvBuffer()
+    buffer.writer.writerow(EXPORT_COLUMNS)
+    yield buffer.drain()
+
+    with SessionLocal() as db:
+        for rows in _partitions(db, export_query().where(Order.id == order_id)):
+            buffer.writer.writerows(format_line_item(row) for row in rows)
+            yield buffer.drain()
+
+def stream_orders_csv(filters: List) -> Iterator[str]:
+    """Stream the line items of every order matching the filters as a single CSV."""
+    buffer = _CsvBuffer()
+    buffer.writer.writerow(BULK_EXPORT_COLUMNS)
+    yield buffer.drain()
+
+    with SessionLocal() as db:
+        for rows in _partitions(db, export_query().where(*filters)):
+            buffer.writer.writerows([row[0], row[1], row[2]] + format_line_item(row) for row in rows)
+            yield buffer.drain()
+
+class _ZipStream(io.RawIOBase):
+    """Unseekable sink that lets zipfile write an archive chunk by chunk."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def archive_name(order_id: int, filename: str) -> str:
+    """Name of an order's CSV inside the export archive."""
+    stem = re.sub(r"[^\w.\-]+", "_", filename.rsplit(".", 1)[0])
+    return f"order_{order_id}_{stem}.csv"
+
+def stream_orders_zip(filters: List) -> Iterator[bytes]:
+    """Stream a zip archive with one CSV per order matching the filters."""
+    sink = _ZipStream()
+    buffer = _CsvBuffer()
+    current_order = None
+    entry = None
+
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with SessionLocal() as db:
+            for rows in _partitions(db, export_query().where(*filters)):
+                for row in rows:
+                    if row[0] != current_order:
+                        if entry is not None:
+                            entry.write(buffer.drain().encode())
+                            entry.close()
+                        current_order = row[0]
+                        entry = archive.open(archive_name(row[0], row[1]), mode="w")
+                        buffer.writer.writerow(EXPORT_COLUMNS)
+                    buffer.writer.writerow(format_line_item(row))
+                if entry is not None:
+                    entry.write(buffer.drain().encode())
+                yield sink.drain()
+        if entry is not None:
+            entry.close()
+    yield sink.drain()
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import logging
+from typing import Dict, List
+from models import ExtractionCacheEntry
+from sqlalchemy import select, delete, func
+from sqlalchemy.orm import Session
+import blobs
+import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_hits = 0
+_misses = 0
+
+def file_sha256(file_path: str) -> str:
+    """Hash a file's contents without loading it into memory at once."""
+    digest = hashlib.sha256()
+    with blobs.open_blob(file_path) as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def get(db: Session, content_hash: str) -> List[Dict] | None:
+    """Return the cached extraction result for a PDF hash, if any."""
+    global _hits, _misses
+    entry = db.get(ExtractionCacheEntry, content_hash)
+    if entry is None:
+        _misses += 1
+        return None
+
+    _hits += 1
+    entry.last_used_at = func.now()
+    db.commit()
+    return json.loads(entry.result)
+
+def put(db: Session, content_hash: str, extracted_items: List[Dict]):
+    """Store an extraction result and evict least recently used entries over the size budget."""
+    result = json.dumps(extracted_items)
+    entry = db.get(ExtractionCacheEntry, content_hash)
+    if entry is None:
+        entry = ExtractionCacheEntry(content_hash=content_hash)
+        db.add(entry)
+    entry.result = result
+    entry.size = len(result.encode())
+    entry.last_used_at = func.now()
+    db.commit()
+    evict(db)
+
+def evict(db: Session):
+    """Delete least recently used entries until the cache fits in its size budget."""
+    total = db.execute(select(func.coalesce(func.sum(ExtractionCacheEntry.size), 0))).scalar()
+    if total <= config.EXTRACTION_CACHE_MAX_BYTES:
+        return
+
+    stale = []
+    rows = db.execute(
+        select(ExtractionCacheEntry.content_hash, ExtractionCacheEntry.size)
+        .order_by(ExtractionCacheEntry.last_used_at)
+    ).all()
+    for content_hash, size in rows:
+        if total <= config.EXTRACTION_CACHE_MAX_BYTES:
+            break
+        stale.append(content_hash)
+        total -= size
+
+    db.execute(delete(ExtractionCacheEntry).where(ExtractionCacheEntry.content_hash.in_(stale)))
+    db.commit()
+    logger.info(f"Evicted {len(stale)} extraction cache entries")
+
+def stats(db: Session) -> Dict:
+    """Return hit/miss counters and the current cache footprint."""
+    entries, size = db.execute(
+        select(func.count(ExtractionCacheEntry.content_hash), func.coalesce(func.sum(ExtractionCacheEntry.size), 0))
+    ).one()
+    lookups = _hits + _misses
+    return {
+        "hits": _hits,
+        "misses": _misses,
+        "hit_ratio": _hits / lookups if lookups else 0.0,
+        "entries": entries,
+        "bytes": size,
+        "max_bytes": config.EXTRACTION_CACHE_MAX_BYTES,
+    }
@@ -0,0 +1,144 @@
+import logging
+import threading
+from array import array
+from typing import Dict, Iterable, List
+from database import SessionLocal
+from models import Product
+from sqlalchemy import select
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FACET_ATTRIBUTES = ["type", "material", "size", "length", "coating", "thread_type"]
+
+class FacetIndex:
+    """Columnar, dictionary-encoded copy of the catalog's attributes for faceted filtering.
+
+    Each attribute value gets a bitmap (a Python int) with bit i set for the product in row i,
+    so filters are bitwise ANDs/ORs and counts are popcounts.
+    """
+
+    def __init__(self, rows: List[tuple]):
+        # rows: (id, description, unit_price, *FACET_ATTRIBUTES)
+        self.ids = array('q', (r[0] for r in rows))
+        self.descriptions = [r[1] for r in rows]
+        self.unit_prices = array('d', (r[2] or 0.0 for r in rows))
+        self.all_rows = (1 << len(rows)) - 1
+
+        self.values: Dict[str, List[str]] = {}
+        self.lookup: Dict[str, Dict[str, int]] = {}
+        self.codes: Dict[str, array] = {}
+        self.bitmaps: Dict[str, List[int]] = {}
+        for col, attribute in enumerate(FACET_ATTRIBUTES, start=3):
+            dictionary: Dict[str, int] = {}
+            codes = array('I')
+            for r in rows:
+                codes.append(dictionary.setdefault(r[col] or "", len(dictionary)))
+
+            # Set bits in byte buffers first; OR-ing into growing ints would be quadratic
+            buffers = [bytearray((len(rows) + 7) // 8) for _ in dictionary]
+            for row, code in enumerate(codes):
+                buffers[code][row >> 3] |= 1 << (row & 7)
+            self.values[attribute] = list(dictionary)
+            self.lookup[attribute] = dictionary
+            self.codes[attribute] = codes
+            self.bitmaps[attribute] = [int.from_bytes(b, "little") for b in buffers]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def attribute_mask(self, attribute: str, selected: Iterable[str]) -> int:
+        """Rows whose attribute is any of the selected values."""
+        mask = 0
+        for value in selected:
+            code = self.lookup[attribute].get(value)
+            if code is not None:
+                mask |= self.bitmaps[attribute][code]
+        return mask
+
+    def product(self, row: int) -> Dict:
+        """Decode one row into the same shape as the product search results."""
+        attributes = {a: self.values[a][self.codes[a][row]] or None for a in FACET_ATTRIBUTES}
+        return {
+            "id": self.ids[row],
+            "description": self.descriptions[row],
+            "category": attributes["type"],  # Using type as category
+            "unit_price": self.unit_prices[row],
+            "material": attributes["material"],
+            "size": attributes["size"],
+            "length": attributes["length"],
+            "coating": attributes["coating"],
+            "thread_type": attributes["thread_type"]
+        }
+
+    def filter(self, selections: Dict[str, List[str]], limit: int = 20, offset: int = 0,
+               facet_limit: int = 50) -> Dict:
+        """Return matching products and, per attribute, value counts under the other filters."""
+        masks = {a: self.attribute_mask(a, v) for a, v in selections.items() if v}
+        matched = self.all_rows
+        for mask in masks.values():
+            matched &= mask
+
+        # Drill-down counts: each attribute is counted with every filter except its own applied
+        facets = {}
+        for attribute in FACET_ATTRIBUTES:
+            base = self.all_rows
+            for other, mask in masks.items():
+                if other != attribute:
+                    base &= mask
+            counts = []
+            if base:
+                for value, bits in zip(self.values[attribute], self.bitmaps[attribute]):
+                    count = (bits & base).bit_count()
+                    if count and value:
+                        counts.append({"value": value, "count": count})
+            counts.sort(key=lambda c: (-c["count"], c["value"]))
+            facets[attribute] = counts[:facet_limit]
+
+        # Walk set bits from the lowest row up to the requested page
+        products = []
+        remaining = matched
+        skipped = 0
+        while remaining and len(products) < limit:
+            lowest = remaining & -remaining
+            remaining ^= lowest
+            if skipped < offset:
+                skipped += 1
+                continue
+            products.append(self.product(lowest.bit_length() - 1))
+
+        return {"total": matched.bit_count(), "products": products, "facets": facets}
+
+_index: FacetIndex | None = None
+_lock = threading.Lock()
+
+def build_index() -> FacetIndex:
+    """Build the facet index from the current product catalog, unless it is already built."""
+    global _index
+    with _lock:
+        # Another caller may have built it while this one waited for the lock
+        if _index is not None:
+            return _index
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(Product.id, Product.description, Product.unit_price,
+                       *(getattr(Product, a) for a in FACET_ATTRIBUTES))
+                .order_by(Product.id)
+            ).all()
+        _index = FacetIndex(rows)
+        logger.info(f"Built facet index over {len(_index)} products")
+        return _index
+
+def get_index() -> FacetIndex:
+    """Return the facet index, building it on first use."""
+    index = _index
+    if index is None:
+        index = build_index()
+    return index
+
+def invalidate_index():
+    """Drop the facet index so it is rebuilt from the reloaded catalog."""
+    global _index
+    with _lock:
+        _index = None
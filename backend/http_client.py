@@ -0,0 +1,57 @@
+import asyncio
+import importlib.util
+import logging
+import httpx
+import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_client: httpx.AsyncClient | None = None
+_semaphore: asyncio.Semaphore | None = None
+
+def _create_client() -> httpx.AsyncClient:
+    """Create a pooled client configured from settings."""
+    http2 = config.HTTP2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP2 is enabled but the 'h2' package is not installed, using HTTP/1.1")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(limits=limits, http2=http2)
+
+async def start():
+    """Open the app-lifetime HTTP client."""
+    global _client, _semaphore
+    if _client is None:
+        _client = _create_client()
+    _semaphore = asyncio.Semaphore(config.UPSTREAM_CONCURRENCY)
+    logger.info(f"Started shared HTTP client (max {config.HTTP_MAX_CONNECTIONS} connections, "
+                f"{config.UPSTREAM_CONCURRENCY} concurrent upstream calls)")
+
+async def stop():
+    """Close the app-lifetime HTTP client and its pooled connections."""
+    global _client, _semaphore
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _semaphore = None
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it when used outside the app lifespan."""
+    global _client
+    if _client is None:
+        _client = _create_client()
+    return _client
+
+def get_semaphore() -> asyncio.Semaphore:
+    """Return the semaphore bounding concurrent upstream calls."""
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(config.UPSTREAM_CONCURRENCY)
+    return _semaphore
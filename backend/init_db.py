@@ -1,23 +1,92 @@
+import argparse
 import csv
 import os
-from models import Base, Product, engine, db_session
+from contextlib import contextmanager
+from database import SessionLocal, engine, ensure_database_directory
+from models import Base, Product, create_schema
+from sqlalchemy import select, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import logging
+import catalog
+import config
+import search
+import stats
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def ensure_schema():
+    """Create the database, its tables and the derived search and stats tables if missing."""
+    ensure_database_directory()
+    if create_schema(engine):
+        logger.info("Created or upgraded database schema")
+    search.ensure_search_index(engine)
+    stats.ensure_aggregates(engine)
+
 def init_db():
     """Initialize the database by dropping all tables and recreating them."""
+    ensure_database_directory()
     logger.info("Dropping all tables...")
+    search.drop_search_index(engine)
     Base.metadata.drop_all(bind=engine)
     
     logger.info("Creating all tables...")
     Base.metadata.create_all(bind=engine)
+    search.ensure_search_index(engine)
+    stats.ensure_aggregates(engine)
+    catalog.invalidate_catalog_caches()
+
+# Catalog CSV column -> products column
+CATALOG_COLUMNS = {
+    'Type': 'type',
+    'Material': 'material',
+    'Size': 'size',
+    'Length': 'length',
+    'Coating': 'coating',
+    'Thread Type': 'thread_type',
+    'Description': 'description',
+}
+
+def read_catalog_rows(catalog_path: str):
+    """Stream product rows from the catalog CSV as dicts keyed by column name."""
+    with open(catalog_path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            yield {column: row[field] for field, column in CATALOG_COLUMNS.items()}
+
+def read_catalog_batches(catalog_path: str, batch_size: int):
+    """Group streamed catalog rows into lists of at most batch_size rows."""
+    batch = []
+    for row in read_catalog_rows(catalog_path):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+@contextmanager
+def bulk_load_pragmas(conn):
+    """Relax SQLite durability for the duration of a bulk load, then restore it."""
+    journal_mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+    synchronous = conn.exec_driver_sql("PRAGMA synchronous").scalar()
+    # Leaving WAL needs exclusive access, and WAL appends are already cheap
+    if journal_mode.lower() != "wal":
+        conn.exec_driver_sql("PRAGMA journal_mode = MEMORY")
+    conn.exec_driver_sql("PRAGMA synchronous = OFF")
+    conn.commit()
+    try:
+        yield
+    finally:
+        # Pragmas can't change journal mode inside an open transaction
+        conn.rollback()
+        conn.exec_driver_sql(f"PRAGMA journal_mode = {journal_mode}")
+        conn.exec_driver_sql(f"PRAGMA synchronous = {synchronous}")
+        conn.commit()
 
 def load_product_catalog():
-    """Load products from the CSV catalog file."""
-    catalog_path = os.path.join('..', 'onsite_documents', 'unique_fastener_catalog.csv')
+    """Bulk load products from the CSV catalog file in a single transaction."""
+    catalog_path = config.PRODUCT_CATALOG_PATH
     
     if not os.path.exists(catalog_path):
         logger.error(f"Product catalog not found at: {catalog_path}")
@@ -27,48 +96,85 @@ def load_product_catalog():
     count = 0
     
     try:
-        with open(catalog_path, 'r') as f:
-            reader = csv.DictReader(f)
-            
-            for row in reader:
-                product = Product(
-                    type=row['Type'],
-                    material=row['Material'],
-                    size=row['Size'],
-                    length=row['Length'],
-                    coating=row['Coating'],
-                    thread_type=row['Thread Type'],
-                    description=row['Description']
-                )
-                db_session.add(product)
-                count += 1
-                
-                # Commit in batches to avoid memory issues
-                if count % 1000 == 0:
-                    db_session.commit()
-                    logger.info(f"Loaded {count} products...")
+        with engine.connect() as conn, bulk_load_pragmas(conn):
+            for batch in read_catalog_batches(catalog_path, config.CATALOG_BATCH_SIZE):
+                conn.execute(insert(Product), batch)
+                count += len(batch)
+                logger.info(f"Loaded {count} products...")
+            conn.commit()
         
-        # Final commit for remaining products
-        db_session.commit()
+        catalog.invalidate_catalog_caches()
         logger.info(f"Successfully loaded {count} products")
         
     except Exception as e:
         logger.error(f"Error loading product catalog: {str(e)}")
-        db_session.rollback()
         raise
 
+def sync_product_catalog() -> dict:
+    """Upsert only new or changed catalog rows, matched to existing products by description."""
+    catalog_path = config.PRODUCT_CATALOG_PATH
+    
+    if not os.path.exists(catalog_path):
+        raise FileNotFoundError(f"Product catalog not found at: {catalog_path}")
+    
+    logger.info("Syncing product catalog...")
+    attributes = [c for c in CATALOG_COLUMNS.values() if c != 'description']
+    
+    with engine.connect() as conn, bulk_load_pragmas(conn):
+        existing = {
+            row.description: tuple(getattr(row, c) for c in attributes)
+            for row in conn.execute(select(Product.description, *[getattr(Product, c) for c in attributes]))
+        }
+        
+        seen = set()
+        inserted = updated = 0
+        for batch in read_catalog_batches(catalog_path, config.CATALOG_BATCH_SIZE):
+            changed = []
+            for row in batch:
+                seen.add(row['description'])
+                current = existing.get(row['description'])
+                if current is None:
+                    inserted += 1
+                elif current != tuple(row[c] for c in attributes):
+                    updated += 1
+                else:
+                    continue
+                changed.append(row)
+            
+            if changed:
+                stmt = sqlite_insert(Product)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[Product.description],
+                    set_={c: stmt.excluded[c] for c in attributes}
+                )
+                conn.execute(stmt, changed)
+        conn.commit()
+    
+    # Products no longer in the CSV are kept so existing line items stay valid
+    result = {
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": len(seen) - inserted - updated,
+        "not_in_catalog": len(existing.keys() - seen),
+    }
+    if inserted or updated:
+        catalog.invalidate_catalog_caches()
+    logger.info(f"Product catalog synced: {result}")
+    return result
+
 def verify_database():
     """Verify that the database was initialized correctly."""
     try:
-        # Check product count
-        product_count = db_session.query(Product).count()
-        logger.info(f"Total products in database: {product_count}")
-        
-        # Sample some products
-        sample_products = db_session.query(Product).limit(5).all()
-        logger.info("Sample products:")
-        for product in sample_products:
-            logger.info(f"- {product.description}")
+        with SessionLocal() as db:
+            # Check product count
+            product_count = db.query(Product).count()
+            logger.info(f"Total products in database: {product_count}")
+            
+            # Sample some products
+            sample_products = db.query(Product).limit(5).all()
+            logger.info("Sample products:")
+            for product in sample_products:
+                logger.info(f"- {product.description}")
         
         return True
     except Exception as e:
@@ -76,14 +182,24 @@ def verify_database():
         return False
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Initialize the database and load the product catalog.")
+    parser.add_argument("--sync", action="store_true",
+                        help="upsert changed catalog rows into the existing database instead of recreating it")
+    args = parser.parse_args()
+    
     try:
-        logger.info("Starting database initialization...")
-        init_db()
-        load_product_catalog()
+        if args.sync:
+            logger.info("Starting product catalog sync...")
+            ensure_schema()
+            sync_product_catalog()
+        else:
+            logger.info("Starting database initialization...")
+            init_db()
+            load_product_catalog()
         if verify_database():
             logger.info("Database initialization completed successfully")
         else:
             logger.error("Database verification failed")
     except Exception as e:
         logger.error(f"Database initialization failed: {str(e)}")
-        raise 
\ No newline at end of file
+        raise
@@ -0,0 +1,347 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+from database import SessionLocal
+from models import Job, LineItem, Order
+from sqlalchemy import select, update, delete, func, and_, or_
+from sqlalchemy.orm import Session
+import config
+import events
+import metrics
+import services
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Number of finished jobs used to estimate processing time
+ETA_SAMPLE_SIZE = 50
+
+_workers: List[asyncio.Task] = []
+_wakeup: asyncio.Event | None = None
+_loop: asyncio.AbstractEventLoop | None = None
+_process_pool: ProcessPoolExecutor | None = None
+# Identifies this API process's workers in Job.claimed_by
+_worker_id: str | None = None
+# Orders being processed by async workers, so a replaced order's run can be cancelled
+_running: Dict[int, asyncio.Task] = {}
+# Event loop kept for the lifetime of a job worker process
+_process_loop: asyncio.AbstractEventLoop | None = None
+
+def job_to_dict(job: Job) -> Dict:
+    """Serialize a job for API responses."""
+    return {
+        "id": job.id,
+        "order_id": job.order_id,
+        "filename": job.filename,
+        "status": job.status,
+        "priority": job.priority,
+        "attempts": job.attempts,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "claimed_by": job.claimed_by,
+    }
+
+def queued_count(db: Session) -> int:
+    """Return the number of jobs waiting to run."""
+    return db.execute(select(func.count(Job.id)).where(Job.status == 'queued')).scalar()
+
+def enqueue(db: Session, order: Order, file_path: str, priority: int = 0, force_extract: bool = False) -> Job:
+    """Persist a processing job for an order and wake up an idle worker."""
+    job = Job(
+        order_id=order.id,
+        file_path=file_path,
+        filename=order.filename,
+        status='queued',
+        priority=priority,
+        force_extract=force_extract,
+    )
+    db.add(job)
+    db.commit()
+    if _wakeup is not None:
+        # Uploads are saved in threadpool threads, so wake the workers through their loop
+        _loop.call_soon_threadsafe(_wakeup.set)
+    return job
+
+def cancel_order(order_id: int):
+    """Cancel the async worker run processing an order that has been deleted or replaced.
+
+    Runs in other API processes are cancelled when renewing their lease finds the job gone.
+    Worker processes can't be interrupted; they stop at their next chunk once the order is gone.
+    """
+    task = _running.get(order_id)
+    if task is not None:
+        # Callable from threadpool threads, like enqueue
+        _loop.call_soon_threadsafe(task.cancel)
+        logger.info(f"Cancelled processing of replaced order {order_id}")
+
+def queue_stats(db: Session) -> Dict:
+    """Report queue depth by status and the estimated time to drain the queue."""
+    counts = dict(db.execute(select(Job.status, func.count(Job.id)).group_by(Job.status)).all())
+
+    recent = (
+        select((func.julianday(Job.finished_at) - func.julianday(Job.started_at)) * 86400.0)
+        .where(Job.status == 'done', Job.started_at.is_not(None), Job.finished_at.is_not(None))
+        .order_by(Job.finished_at.desc())
+        .limit(ETA_SAMPLE_SIZE)
+        .subquery()
+    )
+    avg_seconds = db.execute(select(func.avg(recent.c[0]))).scalar()
+
+    queued = counts.get('queued', 0)
+    running = counts.get('running', 0)
+    eta_seconds = None
+    if avg_seconds is not None:
+        eta_seconds = (queued + running) / max(config.JOB_WORKERS, 1) * avg_seconds
+
+    return {
+        "workers": config.JOB_WORKERS,
+        "mode": config.JOB_WORKER_MODE,
+        "queued": queued,
+        "running": running,
+        "done": counts.get('done', 0),
+        "failed": counts.get('failed', 0),
+        "avg_job_seconds": avg_seconds,
+        "eta_seconds": eta_seconds,
+    }
+
+def _lease_expiry():
+    """SQL expression for when a lease taken or renewed now runs out."""
+    return func.datetime('now', f'+{config.JOB_LEASE_SECONDS} seconds')
+
+def _claimable():
+    """Jobs that are due, or were left running by a worker whose lease expired (e.g. its process died)."""
+    return or_(
+        and_(Job.status == 'queued', Job.next_run_at <= func.now()),
+        and_(Job.status == 'running', or_(Job.lease_expires_at.is_(None), Job.lease_expires_at < func.now())),
+    )
+
+def _fail_abandoned_job(db: Session, job: Job) -> bool:
+    """Fail a job whose last allowed attempt never finished, rather than running it yet again."""
+    fail = (
+        update(Job)
+        .where(Job.id == job.id, _claimable())
+        .values(status='failed', error="Worker stopped during the last attempt", finished_at=func.now(),
+                claimed_by=None, lease_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    if not db.execute(fail).rowcount:
+        db.rollback()
+        return False
+    # A crashed attempt can leave partial line items behind
+    db.execute(delete(LineItem).where(LineItem.order_id == job.order_id))
+    db.execute(update(Order).where(Order.id == job.order_id).values(status='error'))
+    db.commit()
+    metrics.JOBS_FINISHED.inc(outcome="failed")
+    logger.error(f"Job {job.id} for {job.filename} failed after {job.attempts} attempts: worker stopped")
+    order = db.get(Order, job.order_id)
+    if order:
+        events.publish_order(order)
+    return True
+
+def _claim_next_job() -> tuple | None:
+    """Mark the highest-priority runnable job as running under this worker's lease and return its arguments."""
+    with SessionLocal() as db:
+        stmt = (
+            select(Job)
+            .where(_claimable())
+            .order_by(Job.priority.desc(), Job.id)
+            .limit(1)
+        )
+        while True:
+            job = db.execute(stmt).scalar_one_or_none()
+            if job is None:
+                return None
+            if job.attempts >= config.JOB_MAX_ATTEMPTS:
+                # Only happens when the last attempt was cut short, e.g. by a job that crashes its worker
+                _fail_abandoned_job(db, job)
+                continue
+            if job.status == 'running':
+                logger.warning(f"Lease of {job.claimed_by} on job {job.id} expired, running it again")
+            # Workers claim from threads and other processes, so only take the job if nobody took it first
+            claim = (
+                update(Job)
+                .where(Job.id == job.id, _claimable())
+                .values(status='running', attempts=Job.attempts + 1, started_at=func.now(),
+                        claimed_by=_worker_id, lease_expires_at=_lease_expiry())
+                .execution_options(synchronize_session=False)
+            )
+            if db.execute(claim).rowcount:
+                break
+            db.rollback()
+        
+        db.refresh(job)
+        if job.attempts > 1:
+            # Start the retry from a clean order
+            db.execute(delete(LineItem).where(LineItem.order_id == job.order_id))
+            if job.order:
+                job.order.status = 'processing'
+        db.commit()
+        return job.id, job.order_id, job.file_path, job.filename, job.force_extract, job.attempts
+
+def _renew_lease(job_id: int) -> bool:
+    """Extend this worker's lease on a running job, returning False if the job was removed or taken over."""
+    with SessionLocal() as db:
+        renewed = db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == 'running', Job.claimed_by == _worker_id)
+            .values(lease_expires_at=_lease_expiry())
+        ).rowcount
+        db.commit()
+    return renewed > 0
+
+async def _keep_lease(job_id: int, task: asyncio.Task | None = None):
+    """Renew a job's lease while it runs, cancelling the run (if given) once the job is no longer ours."""
+    while True:
+        await asyncio.sleep(config.JOB_LEASE_SECONDS / 3)
+        try:
+            owned = await asyncio.to_thread(_renew_lease, job_id)
+        except Exception as e:
+            logger.warning(f"Couldn't renew the lease on job {job_id}: {str(e)}")
+            continue
+        if not owned:
+            logger.info(f"Job {job_id} was removed or taken over while running")
+            if task is not None:
+                task.cancel()
+            return
+
+async def _run_job(job_id: int, order_id: int, file_path: str, filename: str, force_extract: bool):
+    """Process one claimed job and record its outcome, scheduling a retry on failure."""
+    metrics.JOBS_IN_FLIGHT.inc()
+    heartbeat = None
+    try:
+        with metrics.JOB_SECONDS.time():
+            if config.JOB_WORKER_MODE == "process":
+                heartbeat = asyncio.create_task(_keep_lease(job_id))
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(_process_pool, run_job_in_process, order_id, file_path, force_extract)
+            else:
+                task = asyncio.create_task(services.process_order(order_id, file_path, force_extract=force_extract))
+                _running[order_id] = task
+                heartbeat = asyncio.create_task(_keep_lease(job_id, task))
+                try:
+                    await task
+                finally:
+                    _running.pop(order_id, None)
+        error = None
+    except asyncio.CancelledError:
+        if asyncio.current_task().cancelling():
+            # The worker itself is being stopped
+            raise
+        error = "Cancelled because the order was replaced"
+    except Exception as e:
+        error = str(e) or e.__class__.__name__
+    finally:
+        metrics.JOBS_IN_FLIGHT.dec()
+        if heartbeat is not None:
+            heartbeat.cancel()
+    await asyncio.to_thread(_record_outcome, job_id, filename, error)
+
+def _record_outcome(job_id: int, filename: str, error: str | None):
+    """Mark a finished job as done, or schedule its retry or mark it failed."""
+    with SessionLocal() as db:
+        job = db.get(Job, job_id)
+        if job is None or job.claimed_by != _worker_id:
+            logger.info(f"Job {job_id} was removed or taken over while running")
+            return
+        
+        job.finished_at = func.now()
+        job.claimed_by = None
+        job.lease_expires_at = None
+        if error is None:
+            metrics.JOBS_FINISHED.inc(outcome="done")
+            job.status = 'done'
+            job.error = None
+            logger.info(f"Job {job_id} for {filename} finished")
+        elif job.attempts < config.JOB_MAX_ATTEMPTS:
+            delay = config.JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+            metrics.JOBS_FINISHED.inc(outcome="retry")
+            job.status = 'queued'
+            job.error = error
+            job.next_run_at = func.datetime('now', f'+{int(delay)} seconds')
+            if job.order:
+                job.order.status = 'processing'
+            logger.warning(f"Job {job_id} for {filename} failed (attempt {job.attempts}), retrying in {delay:.0f}s: {error}")
+        else:
+            metrics.JOBS_FINISHED.inc(outcome="failed")
+            job.status = 'failed'
+            job.error = error
+            if job.order:
+                job.order.status = 'error'
+            logger.error(f"Job {job_id} for {filename} failed after {job.attempts} attempts: {error}")
+        db.commit()
+        
+        # Worker processes can't reach this process's subscribers, so publish their outcome here
+        if job.order and (job.status == 'queued' or config.JOB_WORKER_MODE == "process"):
+            events.publish_order(job.order)
+
+async def _worker(worker_id: int):
+    """Claim and run jobs until cancelled."""
+    while True:
+        try:
+            # Cleared before claiming, so a job queued during the claim still wakes this worker
+            _wakeup.clear()
+            claimed = await asyncio.to_thread(_claim_next_job)
+            if claimed is None:
+                try:
+                    await asyncio.wait_for(_wakeup.wait(), timeout=config.JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id, order_id, file_path, filename, force_extract, attempts = claimed
+            logger.info(f"Worker {worker_id} running job {job_id} for {filename} (attempt {attempts})")
+            await _run_job(job_id, order_id, file_path, filename, force_extract)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Worker {worker_id} error: {str(e)}")
+            await asyncio.sleep(config.JOB_POLL_INTERVAL)
+
+def init_worker_process():
+    """Give a job worker process one event loop for all its jobs, so its HTTP client keeps its connections."""
+    global _process_loop
+    _process_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_process_loop)
+
+def run_job_in_process(order_id: int, file_path: str, force_extract: bool):
+    """Entry point for processing an order in a worker process."""
+    _process_loop.run_until_complete(services.process_order(order_id, file_path, force_extract=force_extract))
+
+async def start_workers():
+    """Start the worker pool.
+
+    Jobs interrupted by a stopped or crashed process are claimed again once their lease expires,
+    so starting one API process never takes over jobs another one is still running.
+    """
+    global _wakeup, _loop, _process_pool, _worker_id
+    _wakeup = asyncio.Event()
+    _loop = asyncio.get_running_loop()
+    _worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    if config.JOB_WORKER_MODE == "process":
+        _process_pool = ProcessPoolExecutor(
+            max_workers=config.JOB_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker_process
+        )
+    for worker_id in range(config.JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker(worker_id)))
+    logger.info(f"Started {config.JOB_WORKERS} {config.JOB_WORKER_MODE} job workers")
+
+async def stop_workers():
+    """Stop the worker pool; its running jobs are run again once their lease expires."""
+    global _process_pool
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
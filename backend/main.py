@@ -1,23 +1,79 @@
-from fastapi import FastAPI, UploadFile, File, BackgroundTasks, HTTPException, Body
+from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Query, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import os
-import shutil
+import asyncio
+import hashlib
+import tempfile
+import time
 from typing import List
-import services
-from models import Order, LineItem, db_session, Base, engine, Product
-from sqlalchemy import select
+from database import get_db
+from models import Order, LineItem, Job, ArchivedOrder
+from sqlalchemy import select, tuple_, update, delete
+from sqlalchemy.orm import Session
 import logging
-from datetime import datetime
-from init_db import init_db, load_product_catalog, verify_database
-import io
-import csv
+from datetime import datetime, timezone
+from init_db import init_db, ensure_schema, load_product_catalog, sync_product_catalog, verify_database
+import json
+import base64
+from contextlib import asynccontextmanager
+import blobs
+import catalog
+import config
+import events
+import exports
+import extraction_cache
+import facets
+import http_client
+import jobs
+import match_cache
+import metrics
+import pdf_extraction
+import retention
+import search
+import stats
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
+logging.getLogger().setLevel(config.LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Background warm-up of the in-memory catalog caches, reported by /ready
+warmup = {"status": "pending", "seconds": None, "error": None}
+
+async def warm_caches():
+    """Build the catalog caches and indexes off the event loop; requests fall back to the database until then."""
+    warmup.update(status="running", seconds=None, error=None)
+    start = time.perf_counter()
+    try:
+        await asyncio.to_thread(catalog.warm_catalog_caches)
+        warmup.update(status="ready", seconds=round(time.perf_counter() - start, 3))
+        logger.info(f"Catalog caches warmed in {warmup['seconds']}s")
+    except Exception as e:
+        warmup.update(status="failed", error=str(e))
+        logger.error(f"Catalog cache warm-up failed: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Prepare the database, open the shared HTTP client, run the job workers and warm caches and apply retention in the background."""
+    start = time.perf_counter()
+    await asyncio.to_thread(ensure_schema)
+    os.makedirs(config.UPLOAD_DIR, exist_ok=True)
+    await http_client.start()
+    await jobs.start_workers()
+    warmup_task = asyncio.create_task(warm_caches())
+    retention_task = asyncio.create_task(retention.run_periodically())
+    logger.info(f"Started in {time.perf_counter() - start:.3f}s")
+    try:
+        yield
+    finally:
+        warmup_task.cancel()
+        retention_task.cancel()
+        await jobs.stop_workers()
+        pdf_extraction.stop_pool()
+        await http_client.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -28,12 +84,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Ensure uploads directory exists
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+UPLOAD_DIR = config.UPLOAD_DIR
+
+PDF_MAGIC = b"%PDF-"
 
 @app.post("/cleanup")
-async def cleanup_system():
+def cleanup_system():
     """Clear the database and uploads directory, then reload the product catalog."""
     try:
         logger.info("Starting system cleanup...")
@@ -49,107 +105,336 @@ async def cleanup_system():
         else:
             raise Exception("Failed to verify database after loading product catalog")
         
+        # Rebuild in-memory catalog caches from the new catalog
+        catalog.warm_catalog_caches()
+        
         # Clear uploads directory
+        blobs.clear()
         for file in os.listdir(UPLOAD_DIR):
             file_path = os.path.join(UPLOAD_DIR, file)
             if os.path.isfile(file_path):
                 os.remove(file_path)
         logger.info("Uploads directory cleared")
         
+        # Tell connected clients to reload everything
+        events.publish("reset", None, {})
+        
         return {"message": "System cleaned up and product catalog reloaded successfully"}
     except Exception as e:
         logger.error(f"Cleanup failed: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/catalog/sync")
+def sync_catalog():
+    """Upsert new and changed products from the catalog CSV without touching orders."""
+    try:
+        result = sync_product_catalog()
+        if result["inserted"] or result["updated"]:
+            catalog.warm_catalog_caches()
+        return result
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Catalog sync failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 def get_unique_filename(filename: str) -> str:
     """Generate a unique filename by adding a timestamp if needed."""
     name, ext = os.path.splitext(filename)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     return f"{name}_{timestamp}{ext}"
 
-async def process_uploaded_file(file_path: str, file_name: str):
-    """Background task to process the uploaded file."""
-    try:
-        logger.info(f"Starting to process file: {file_name}")
-        await services.process_order(file_path, file_name)
-        logger.info(f"Successfully processed file: {file_name}")
-    except Exception as e:
-        logger.error(f"Error processing file {file_name}: {str(e)}")
-        # Get the order and update its status
-        stmt = select(Order).where(Order.filename == file_name)
-        order = db_session.execute(stmt).scalar_one_or_none()
-        if order:
-            order.status = 'error'
-            db_session.commit()
-            logger.info(f"Updated order status to error for file: {file_name}")
-        raise e
+async def write_upload(file: UploadFile) -> tuple:
+    """Write an upload in chunks off the event loop, hashing it and enforcing the size limit on the way.
 
-@app.post("/upload")
-async def upload_file(
-    file: UploadFile = File(...),
-    background_tasks: BackgroundTasks = BackgroundTasks()
-):
-    """Handle file upload and initiate processing."""
-    logger.info(f"Received upload request for file: {file.filename}")
+    The file is then moved into the blob store under its content hash; returns (path, hash, size, already stored).
+    """
+    first_chunk = await file.read(config.UPLOAD_CHUNK_SIZE)
+    if not first_chunk.startswith(PDF_MAGIC):
+        logger.warning(f"Rejected file without PDF header: {file.filename}")
+        raise HTTPException(status_code=400, detail="File is not a valid PDF")
     
+    # Write to a private temporary file; the content hash is only known once it is complete
+    fd, partial_path = await asyncio.to_thread(tempfile.mkstemp, suffix=".part", dir=UPLOAD_DIR)
+    digest = hashlib.sha256()
+    size = 0
+    buffer = os.fdopen(fd, "wb")
+    try:
+        chunk = first_chunk
+        while chunk:
+            size += len(chunk)
+            if size > config.UPLOAD_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"File exceeds the {config.UPLOAD_MAX_BYTES} byte limit")
+            digest.update(chunk)
+            await asyncio.to_thread(buffer.write, chunk)
+            chunk = await file.read(config.UPLOAD_CHUNK_SIZE)
+        await asyncio.to_thread(buffer.close)
+        content_hash = digest.hexdigest()
+        file_path, already_stored = await asyncio.to_thread(blobs.store, partial_path, content_hash)
+    except BaseException:
+        await asyncio.to_thread(buffer.close)
+        if os.path.exists(partial_path):
+            await asyncio.to_thread(os.remove, partial_path)
+        raise
+    
+    return file_path, content_hash, size, already_stored
+
+async def save_upload(db: Session, file: UploadFile, force_extract: bool = False, priority: int = 0) -> dict:
+    """Save an uploaded PDF, replace any order with the same filename and queue it for processing."""
     if not file.filename.lower().endswith('.pdf'):
         logger.warning(f"Rejected non-PDF file: {file.filename}")
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
-    # Use original filename for API compatibility
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
+    if file.size is not None and file.size > config.UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"File exceeds the {config.UPLOAD_MAX_BYTES} byte limit")
     
-    # Remove existing file if it exists
-    if os.path.exists(file_path):
-        os.remove(file_path)
-        logger.info(f"Removed existing file: {file_path}")
-    
-    # Save the uploaded file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    logger.info(f"Saved uploaded file to: {file_path}")
+    # Save the uploaded file, stored once per distinct content
+    with metrics.stage("upload_write"):
+        file_path, content_hash, size, already_stored = await write_upload(file)
+    if already_stored:
+        logger.info(f"{file.filename} is already stored at {file_path} ({size} bytes, sha256 {content_hash[:12]})")
+    else:
+        logger.info(f"Saved uploaded file to: {file_path} ({size} bytes, sha256 {content_hash[:12]})")
     
     try:
-        # Delete any existing order with this filename
-        stmt = select(Order).where(Order.filename == file.filename)
-        existing_order = db_session.execute(stmt).scalar_one_or_none()
-        if existing_order:
-            db_session.delete(existing_order)
-            db_session.commit()
-            logger.info(f"Deleted existing order for file: {file.filename}")
-        
-        # Create new order record
-        order = Order(filename=file.filename, status='processing')
-        db_session.add(order)
-        db_session.commit()
-        logger.info(f"Created new order record for file: {file.filename}")
-        
-        # Start processing in background
-        background_tasks.add_task(process_uploaded_file, file_path, file.filename)
-        logger.info(f"Started background processing for file: {file.filename}")
-        
-        return {"id": order.id, "status": order.status}
+        # The database work runs in the threadpool so lock waits can't stall the event loop
+        return await asyncio.to_thread(
+            register_upload, db, file.filename, file_path, content_hash, force_extract, priority
+        )
     except Exception as e:
         logger.error(f"Error handling upload for file {file.filename}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def register_upload(db: Session, filename: str, file_path: str, content_hash: str,
+                    force_extract: bool, priority: int) -> dict:
+    """Replace any order with the same filename by a new order for a stored upload, and queue it."""
+    # Delete any existing order (and its pending jobs) with this filename
+    stmt = select(Order.id).where(Order.filename == filename)
+    existing_order_id = db.execute(stmt).scalar_one_or_none()
+    if existing_order_id is not None:
+        # Deleting the order row first takes the write lock, so no chunk can be saved for it
+        # before its line items are deleted in the same transaction
+        db.execute(delete(Order).where(Order.id == existing_order_id))
+        db.execute(delete(LineItem).where(LineItem.order_id == existing_order_id))
+        db.execute(delete(Job).where(Job.order_id == existing_order_id))
+        db.commit()
+        jobs.cancel_order(existing_order_id)
+        events.publish("order_deleted", existing_order_id, {"id": existing_order_id})
+        logger.info(f"Deleted existing order for file: {filename}")
+    
+    # Look for an earlier upload of the same content under another name
+    duplicate_of = db.execute(
+        select(Order.id).where(Order.content_hash == content_hash).order_by(Order.id.desc()).limit(1)
+    ).scalar_one_or_none()
+    if duplicate_of:
+        logger.info(f"{filename} has the same content as order {duplicate_of}")
+    
+    # Create new order record
+    order = Order(filename=filename, status='processing', content_hash=content_hash)
+    db.add(order)
+    db.commit()
+    events.publish_order(order)
+    logger.info(f"Created new order record for file: {filename}")
+    
+    # Queue the order for the processing workers
+    job = jobs.enqueue(db, order, file_path, priority=priority, force_extract=force_extract)
+    logger.info(f"Queued job {job.id} for file: {filename}")
+    
+    return {
+        "id": order.id,
+        "status": order.status,
+        "job_id": job.id,
+        "content_hash": content_hash,
+        "duplicate_of": duplicate_of
+    }
+
+def ensure_queue_capacity(db: Session, count: int):
+    """Reject uploads with 503 when the processing queue is full."""
+    if jobs.queued_count(db) + count > config.JOB_QUEUE_MAX:
+        raise HTTPException(
+            status_code=503,
+            detail="Processing queue is full, please retry later",
+            headers={"Retry-After": "30"}
+        )
+
+@app.post("/upload")
+async def upload_file(
+    file: UploadFile = File(...),
+    force_extract: bool = Query(False, description="Re-run extraction even if this PDF was seen before"),
+    priority: int = Query(0, description="Jobs with higher priority are processed first"),
+    db: Session = Depends(get_db)
+):
+    """Handle file upload and queue it for processing."""
+    logger.info(f"Received upload request for file: {file.filename}")
+    await asyncio.to_thread(ensure_queue_capacity, db, 1)
+    return await save_upload(db, file, force_extract=force_extract, priority=priority)
+
+@app.post("/upload/batch")
+async def upload_batch(
+    files: List[UploadFile] = File(...),
+    force_extract: bool = Query(False, description="Re-run extraction even if a PDF was seen before"),
+    priority: int = Query(0, description="Jobs with higher priority are processed first"),
+    db: Session = Depends(get_db)
+):
+    """Handle a multi-file upload, queueing every PDF and reporting per-file results."""
+    logger.info(f"Received batch upload request for {len(files)} files")
+    await asyncio.to_thread(ensure_queue_capacity, db, len(files))
+    
+    results = []
+    for file in files:
+        try:
+            result = await save_upload(db, file, force_extract=force_extract, priority=priority)
+            results.append({"filename": file.filename, **result})
+        except HTTPException as e:
+            results.append({"filename": file.filename, "error": e.detail})
+    return results
+
+@app.get("/jobs")
+def list_jobs(status: str | None = None, limit: int = Query(50, ge=1, le=500), db: Session = Depends(get_db)):
+    """Report queue depth and ETA along with the most recent jobs."""
+    stmt = select(Job).order_by(Job.id.desc()).limit(limit)
+    if status:
+        stmt = stmt.where(Job.status == status)
+    recent_jobs = db.execute(stmt).scalars().all()
+    return {"summary": jobs.queue_stats(db), "jobs": [jobs.job_to_dict(j) for j in recent_jobs]}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    """Get a single processing job."""
+    job = db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs.job_to_dict(job)
+
+def to_sqlite_timestamp(value: datetime) -> str:
+    """Format a datetime the way SQLite's CURRENT_TIMESTAMP stores it (UTC, no fraction)."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+def encode_cursor(created_at: datetime, order_id: int) -> str:
+    """Build an opaque cursor pointing just past the given order."""
+    raw = json.dumps([to_sqlite_timestamp(created_at), order_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    """Decode a cursor produced by encode_cursor."""
+    try:
+        created_at, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(created_at), int(order_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def order_filters(
+    status: List[str] | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+    filename_prefix: str | None = None
+) -> list:
+    """Build WHERE clauses for the order list filters."""
+    filters = []
+    if status:
+        filters.append(Order.status.in_(status))
+    if created_from:
+        filters.append(Order.created_at >= to_sqlite_timestamp(created_from))
+    if created_to:
+        filters.append(Order.created_at < to_sqlite_timestamp(created_to))
+    if filename_prefix:
+        # A range instead of LIKE so the filename index can be used
+        filters.append(Order.filename >= filename_prefix)
+        filters.append(Order.filename < filename_prefix + "\uffff")
+    return filters
+
 @app.get("/orders")
-async def list_orders() -> List[dict]:
-    """List all orders."""
-    stmt = select(Order)
-    orders = db_session.execute(stmt).scalars().all()
-    return [{"id": o.id, "filename": o.filename, "status": o.status, 
-             "created_at": o.created_at.isoformat(), 
-             "updated_at": o.updated_at.isoformat()} for o in orders]
+def list_orders(
+    status: List[str] | None = Query(None, description="Only return orders with these statuses"),
+    created_from: datetime | None = Query(None, description="Only return orders created at or after this time (UTC)"),
+    created_to: datetime | None = Query(None, description="Only return orders created before this time (UTC)"),
+    filename_prefix: str | None = Query(None, description="Only return orders whose filename starts with this"),
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """List orders newest first, one keyset-paginated page at a time."""
+    stmt = select(Order.id, Order.filename, Order.status, Order.created_at, Order.updated_at)
+    stmt = stmt.where(*order_filters(status, created_from, created_to, filename_prefix))
+    if cursor:
+        stmt = stmt.where(tuple_(Order.created_at, Order.id) < tuple_(*decode_cursor(cursor)))
+    
+    stmt = stmt.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1)
+    rows = db.execute(stmt).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    
+    return {
+        "orders": [
+            {"id": r.id, "filename": r.filename, "status": r.status,
+             "created_at": r.created_at.isoformat(),
+             "updated_at": r.updated_at.isoformat()}
+            for r in rows
+        ],
+        "next_cursor": next_cursor
+    }
+
+@app.get("/orders/export")
+def export_orders(
+    status: List[str] | None = Query(None, description="Only export orders with these statuses"),
+    created_from: datetime | None = Query(None, description="Only export orders created at or after this time (UTC)"),
+    created_to: datetime | None = Query(None, description="Only export orders created before this time (UTC)"),
+    filename_prefix: str | None = Query(None, description="Only export orders whose filename starts with this"),
+    format: str = Query("csv", pattern="^(csv|zip)$", description="One combined CSV, or a zip with one CSV per order")
+):
+    """Stream the line items of many orders as one CSV or a zip archive."""
+    filters = order_filters(status, created_from, created_to, filename_prefix)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    
+    if format == "zip":
+        return StreamingResponse(
+            exports.stream_orders_zip(filters),
+            headers={"Content-Disposition": f'attachment; filename="orders_{timestamp}.zip"'},
+            media_type="application/zip"
+        )
+    return StreamingResponse(
+        exports.stream_orders_csv(filters),
+        headers={"Content-Disposition": f'attachment; filename="orders_{timestamp}.csv"'},
+        media_type="text/csv"
+    )
+
+@app.get("/orders/events")
+async def order_events(order_id: int | None = None, last_event_id: str | None = Header(None)):
+    """Stream order and line item changes as Server-Sent Events, optionally for a single order."""
+    headers = {
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    }
+    return StreamingResponse(
+        events.stream(order_id, last_event_id),
+        headers=headers,
+        media_type="text/event-stream"
+    )
 
 @app.get("/orders/{order_id}")
-async def get_order(order_id: int):
+def get_order(order_id: int, db: Session = Depends(get_db)):
     """Get order details including line items."""
-    stmt = select(Order).where(Order.id == order_id)
-    order = db_session.execute(stmt).scalar_one_or_none()
-    if not order:
+    # One outer-joined query: an order without line items yields a single row of NULL items
+    stmt = (
+        select(
+            Order.id, Order.filename, Order.status, Order.created_at, Order.updated_at,
+            LineItem.id.label("item_id"), LineItem.extracted_text,
+            LineItem.matched_product_id, LineItem.confidence_score
+        )
+        .outerjoin(LineItem, LineItem.order_id == Order.id)
+        .where(Order.id == order_id)
+        .order_by(LineItem.id)
+    )
+    rows = db.execute(stmt).all()
+    if not rows:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    order = rows[0]
     return {
         "order": {
             "id": order.id,
@@ -160,81 +445,126 @@ async def get_order(order_id: int):
         },
         "line_items": [
             {
-                "id": item.id,
-                "order_id": item.order_id,
-                "extracted_text": item.extracted_text,
-                "matched_product_id": item.matched_product_id,
-                "confidence_score": item.confidence_score
+                "id": row.item_id,
+                "order_id": row.id,
+                "extracted_text": row.extracted_text,
+                "matched_product_id": row.matched_product_id,
+                "confidence_score": row.confidence_score
             }
-            for item in order.line_items
+            for row in rows
+            if row.item_id is not None
         ]
     }
 
 @app.post("/orders/{order_id}/line-items/{item_id}")
-async def update_line_item(order_id: int, item_id: int, product_id: int):
+def update_line_item(order_id: int, item_id: int, product_id: int, db: Session = Depends(get_db)):
     """Update a line item's matched product."""
     stmt = select(LineItem).where(LineItem.id == item_id, LineItem.order_id == order_id)
-    line_item = db_session.execute(stmt).scalar_one_or_none()
+    line_item = db.execute(stmt).scalar_one_or_none()
     if not line_item:
         raise HTTPException(status_code=404, detail="Line item not found")
+    if not catalog.existing_product_ids(db, [product_id]):
+        raise HTTPException(status_code=400, detail="Product not found")
     
     line_item.matched_product_id = product_id
-    db_session.commit()
+    db.commit()
     
-    return {
+    result = {
         "id": line_item.id,
         "order_id": line_item.order_id,
         "extracted_text": line_item.extracted_text,
         "matched_product_id": line_item.matched_product_id,
         "confidence_score": line_item.confidence_score
     }
+    events.publish("line_item", order_id, result)
+    return result
 
-@app.get("/orders/{order_id}/export")
-async def export_order(order_id: int):
-    """Export order details as CSV."""
-    # Get order and line items
-    stmt = select(Order).where(Order.id == order_id)
-    order = db_session.execute(stmt).scalar_one_or_none()
-    if not order:
+def parse_line_item_change(change) -> tuple:
+    """Validate one batch change, returning (item_id, values, error)."""
+    if not isinstance(change, dict):
+        return None, None, "invalid"
+    item_id = change.get("item_id")
+    if not isinstance(item_id, int) or isinstance(item_id, bool):
+        return item_id, None, "invalid_item_id"
+    
+    values = {}
+    if change.get("product_id") is not None:
+        product_id = change["product_id"]
+        if not isinstance(product_id, int) or isinstance(product_id, bool):
+            return item_id, None, "invalid_product"
+        values["matched_product_id"] = product_id
+    if change.get("quantity") is not None:
+        quantity = change["quantity"]
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            return item_id, None, "invalid_quantity"
+        values["quantity"] = quantity
+    if not values:
+        return item_id, None, "no_changes"
+    return item_id, values, None
+
+@app.post("/orders/{order_id}/line-items")
+def update_line_items(order_id: int, changes: List[dict] = Body(..., embed=True), db: Session = Depends(get_db)):
+    """Apply a batch of line item changes ({item_id, product_id, quantity}) in one transaction."""
+    if len(changes) > config.LINE_ITEM_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {config.LINE_ITEM_BATCH_MAX} changes per request")
+    if db.execute(select(Order.id).where(Order.id == order_id)).scalar_one_or_none() is None:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    # Create CSV file in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
+    parsed = [parse_line_item_change(change) for change in changes]
+    item_ids = {item_id for item_id, values, error in parsed if error is None}
+    product_ids = {values["matched_product_id"] for _, values, error in parsed
+                   if error is None and "matched_product_id" in values}
     
-    # Write header
-    writer.writerow([
-        "Line Item ID", "Extracted Text", "Matched Product ID",
-        "Product Description", "Product Type", "Material",
-        "Size", "Length", "Coating", "Thread Type",
-        "Quantity", "Confidence Score"
-    ])
+    # One lookup each for the order's items and the referenced products
+    order_item_ids = set()
+    ids = list(item_ids)
+    for i in range(0, len(ids), catalog.IN_CLAUSE_CHUNK_SIZE):
+        chunk = ids[i:i + catalog.IN_CLAUSE_CHUNK_SIZE]
+        order_item_ids.update(db.execute(
+            select(LineItem.id).where(LineItem.order_id == order_id, LineItem.id.in_(chunk))
+        ).scalars())
+    known_products = catalog.existing_product_ids(db, product_ids)
     
-    # Write data
-    for item in order.line_items:
-        product = None
-        if item.matched_product_id:
-            stmt = select(Product).where(Product.id == item.matched_product_id)
-            product = db_session.execute(stmt).scalar_one_or_none()
-        
-        writer.writerow([
-            item.id,
-            item.extracted_text,
-            item.matched_product_id or "",
-            product.description if product else "",
-            product.type if product else "",
-            product.material if product else "",
-            product.size if product else "",
-            product.length if product else "",
-            product.coating if product else "",
-            product.thread_type if product else "",
-            item.quantity,
-            f"{item.confidence_score:.2f}"
-        ])
+    results = []
+    updates = []
+    seen = set()
+    for item_id, values, error in parsed:
+        if error is None:
+            if item_id in seen:
+                error = "duplicate"
+            elif item_id not in order_item_ids:
+                error = "not_found"
+            elif "matched_product_id" in values and values["matched_product_id"] not in known_products:
+                error = "invalid_product"
+        if error is not None:
+            results.append({"item_id": item_id, "status": error})
+            continue
+        seen.add(item_id)
+        updates.append({"id": item_id, **values})
+        results.append({
+            "item_id": item_id,
+            "status": "updated",
+            "product_id": values.get("matched_product_id"),
+            "quantity": values.get("quantity")
+        })
+    
+    if updates:
+        # Bulk UPDATE by primary key, executed as executemany
+        db.execute(update(LineItem), updates)
+        db.commit()
+        events.publish("line_items", order_id, {"order_id": order_id, "updated": [u["id"] for u in updates]})
+    
+    return {"order_id": order_id, "updated": len(updates), "results": results}
+
+@app.get("/orders/{order_id}/export")
+def export_order(order_id: int, db: Session = Depends(get_db)):
+    """Export order details as CSV, streamed in chunks of line items."""
+    order_filename = db.execute(select(Order.filename).where(Order.id == order_id)).scalar_one_or_none()
+    if order_filename is None:
+        raise HTTPException(status_code=404, detail="Order not found")
     
     # Prepare the response
-    output.seek(0)
-    filename = f"order_{order.filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    filename = f"order_{order_filename}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
     
     headers = {
         "Content-Disposition": f'attachment; filename="{filename}"',
@@ -242,40 +572,90 @@ async def export_order(order_id: int):
     }
     
     return StreamingResponse(
-        iter([output.getvalue()]),
+        exports.stream_order_csv(order_id),
         headers=headers,
         media_type="text/csv"
     )
 
 @app.post("/orders/{order_id}/status")
-async def update_order_status(order_id: int, status_data: dict = Body(...)):
+def update_order_status(order_id: int, status_data: dict = Body(...), db: Session = Depends(get_db)):
     """Update order status."""
     status = status_data.get('status')
     if not status or status not in ['processing', 'needs_review', 'completed', 'error']:
         raise HTTPException(status_code=400, detail="Invalid status")
     
     stmt = select(Order).where(Order.id == order_id)
-    order = db_session.execute(stmt).scalar_one_or_none()
+    order = db.execute(stmt).scalar_one_or_none()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
     order.status = status
-    db_session.commit()
+    db.commit()
+    events.publish_order(order)
     
-    return {
-        "id": order.id,
-        "filename": order.filename,
-        "status": order.status,
-        "created_at": order.created_at.isoformat(),
-        "updated_at": order.updated_at.isoformat()
-    }
+    return events.order_to_dict(order)
+
+@app.get("/archive")
+def list_archived_orders(
+    filename_prefix: str | None = Query(None, description="Only return archived orders whose filename starts with this"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    """List archived orders, most recently archived first."""
+    stmt = select(ArchivedOrder)
+    if filename_prefix:
+        stmt = stmt.where(ArchivedOrder.filename >= filename_prefix, ArchivedOrder.filename < filename_prefix + "\uffff")
+    archived = db.execute(
+        stmt.order_by(ArchivedOrder.archived_at.desc(), ArchivedOrder.id.desc()).limit(limit).offset(offset)
+    ).scalars().all()
+    return {"orders": [retention.archived_order_to_dict(a) for a in archived], "limit": limit, "offset": offset}
+
+@app.post("/archive/run")
+async def run_archive(
+    older_than_days: float | None = Query(None, gt=0, description="Archive completed orders not updated for this many days (default: RETENTION_DAYS)")
+):
+    """Archive old completed orders now and remove uploads no live order refers to."""
+    if older_than_days is None and config.RETENTION_DAYS <= 0:
+        raise HTTPException(status_code=400, detail="No retention period configured; pass older_than_days")
+    return await asyncio.to_thread(retention.run_retention, older_than_days)
+
+@app.post("/archive/{archive_id}/restore")
+def restore_archived_order(archive_id: int, db: Session = Depends(get_db)):
+    """Move an archived order and its line items back into the live tables."""
+    try:
+        order = retention.restore_order(db, archive_id)
+    except retention.RestoreConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if order is None:
+        raise HTTPException(status_code=404, detail="Archived order not found")
+    return events.order_to_dict(order)
+
+@app.get("/ready")
+def readiness():
+    """Report whether startup warm-up has finished; 503 until the catalog caches are built."""
+    body = {"ready": warmup["status"] == "ready", **warmup}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+@app.get("/metrics")
+def get_metrics():
+    """Expose processing metrics in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats")
+def get_stats(db: Session = Depends(get_db)):
+    """Dashboard aggregates: order counts by status, confidence distribution and the latest orders."""
+    return stats.get_stats(db)
+
+@app.get("/cache/stats")
+def cache_stats(db: Session = Depends(get_db)):
+    """Report cache hit/miss counters and sizes."""
+    return {"extraction": extraction_cache.stats(db), "matching": match_cache.stats()}
 
 @app.get("/products/search")
-async def search_products(q: str):
-    """Search products by description."""
-    # Use a simple LIKE query for fuzzy matching
-    stmt = select(Product).where(Product.description.ilike(f"%{q}%")).limit(10)
-    products = db_session.execute(stmt).scalars().all()
+def search_products(q: str, limit: int = Query(10, ge=1, le=100), offset: int = Query(0, ge=0), db: Session = Depends(get_db)):
+    """Search products by description using the full-text index."""
+    products = search.search_products(db, q, limit=limit, offset=offset)
     return [
         {
             "id": p.id,
@@ -291,6 +671,25 @@ async def search_products(q: str):
         for p in products
     ]
 
+@app.get("/products/facets")
+def filter_products(
+    type: List[str] | None = Query(None),
+    material: List[str] | None = Query(None),
+    size: List[str] | None = Query(None),
+    length: List[str] | None = Query(None),
+    coating: List[str] | None = Query(None),
+    thread_type: List[str] | None = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    facet_limit: int = Query(50, ge=1, le=1000)
+):
+    """Filter products by attribute values (repeat a parameter to OR values) and count each facet."""
+    selections = {
+        "type": type, "material": material, "size": size,
+        "length": length, "coating": coating, "thread_type": thread_type
+    }
+    return facets.get_index().filter(selections, limit=limit, offset=offset, facet_limit=facet_limit)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
@@ -0,0 +1,84 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List
+import config
+from matching import normalize
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Normalized query -> (expiry time, matches), least recently used first
+_entries: "OrderedDict[str, tuple[float, List[Dict]]]" = OrderedDict()
+_lock = threading.Lock()
+_generation = 0
+
+_hits = 0
+_misses = 0
+_fetched_queries = 0
+_fetch_seconds = 0.0
+
+def generation() -> int:
+    """Return a token that changes whenever the cache is cleared."""
+    return _generation
+
+def get_many(queries: List[str]) -> Dict[str, List[Dict]]:
+    """Return cached matches for the queries that have live entries."""
+    global _hits, _misses
+    now = time.monotonic()
+    found = {}
+    with _lock:
+        for query in queries:
+            key = normalize(query)
+            entry = _entries.get(key)
+            if entry is not None and entry[0] > now:
+                _entries.move_to_end(key)
+                found[query] = entry[1]
+            elif entry is not None:
+                del _entries[key]
+        _hits += len(found)
+        _misses += len(queries) - len(found)
+    return found
+
+def put_many(results: Dict[str, List[Dict]], generation_token: int):
+    """Cache fresh matches unless the catalog was reloaded while they were fetched."""
+    expires_at = time.monotonic() + config.MATCH_CACHE_TTL
+    with _lock:
+        if generation_token != _generation:
+            return
+        for query, matches in results.items():
+            key = normalize(query)
+            _entries[key] = (expires_at, matches)
+            _entries.move_to_end(key)
+        while len(_entries) > config.MATCH_CACHE_MAX_ENTRIES:
+            _entries.popitem(last=False)
+
+def record_fetch(seconds: float, query_count: int):
+    """Record how long it took to match uncached queries, to estimate time saved by hits."""
+    global _fetched_queries, _fetch_seconds
+    with _lock:
+        _fetched_queries += query_count
+        _fetch_seconds += seconds
+
+def clear():
+    """Drop every cached match, e.g. after the product catalog is reloaded."""
+    global _generation
+    with _lock:
+        _entries.clear()
+        _generation += 1
+
+def stats() -> Dict:
+    """Return hit/miss counters and the estimated matching time saved by hits."""
+    lookups = _hits + _misses
+    per_query = _fetch_seconds / _fetched_queries if _fetched_queries else 0.0
+    return {
+        "hits": _hits,
+        "misses": _misses,
+        "hit_ratio": _hits / lookups if lookups else 0.0,
+        "entries": len(_entries),
+        "max_entries": config.MATCH_CACHE_MAX_ENTRIES,
+        "avg_fetch_seconds_per_query": per_query,
+        "saved_seconds_estimate": _hits * per_query,
+    }
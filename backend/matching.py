@@ -0,0 +1,259 @@
+import heapq
+import logging
+import math
+import threading
+from array import array
+from collections import Counter, defaultdict
+from operator import itemgetter
+from typing import Dict, List
+from database import SessionLocal
+from models import Product
+from sqlalchemy import select
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+NGRAM_SIZE = 3
+# Grams found in more than this share of products (e.g. "ste", "eel") are kept as bitmaps
+# rather than posting lists, so a query never walks a posting list the size of the catalog
+COMMON_GRAM_RATIO = 0.02
+# Candidates taken per requested match from each of the rare-gram scores and the
+# common-gram weight sums, scored against the whole query before the exactness check
+CANDIDATES_PER_MATCH = 20
+# Common-gram query weights are summed as integers, in this many steps of the largest, rounded up
+WEIGHT_STEPS = 1024
+# Products are grouped by the inverse of their vector norm in steps of this ratio, which bounds
+# how much a product's common grams can add to its score
+NORM_BUCKET_RATIO = 1.1
+# Bisection steps used to size the pool of common-gram candidates
+POOL_BISECTIONS = 8
+# Bit positions set in each byte value, for listing the products in a bitmap
+BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+def normalize(text: str) -> str:
+    """Lowercase and collapse whitespace so equivalent descriptions compare equal."""
+    return " ".join(text.lower().split())
+
+def char_ngrams(text: str, n: int = NGRAM_SIZE) -> Counter:
+    """Count the character n-grams of a normalized, space-padded string."""
+    padded = f" {normalize(text)} "
+    return Counter(padded[i:i + n] for i in range(max(len(padded) - n + 1, 1)))
+
+class ProductMatcher:
+    """Character n-gram TF-IDF index over product descriptions."""
+
+    def __init__(self, descriptions: List[str]):
+        self.descriptions = descriptions
+        doc_grams = [char_ngrams(d) for d in descriptions]
+
+        doc_freq = Counter()
+        for grams in doc_grams:
+            doc_freq.update(grams.keys())
+
+        total = len(descriptions)
+        self.idf = {g: math.log((total + 1) / (df + 1)) + 1.0 for g, df in doc_freq.items()}
+        self.unseen_idf = math.log(total + 1) + 1.0
+        common_df = max(int(total * COMMON_GRAM_RATIO), 1)
+
+        # Inverted index for rare grams: n-gram -> [(doc index, L2-normalized weight)]
+        self.postings = defaultdict(list)
+        # Forward index: doc i's gram ids and weights are doc_grams/doc_weights[offsets[i]:offsets[i + 1]]
+        self.gram_ids = {g: i for i, g in enumerate(doc_freq)}
+        self.offsets = array('L', [0])
+        self.doc_grams = array('L')
+        self.doc_weights = array('d')
+        # Common grams: one bitmap (bit i set for doc i) per gram and occurrence count, so every
+        # doc in a bitmap has the same unnormalized weight; filled in byte buffers and converted once
+        common = {g for g, df in doc_freq.items() if df > common_df}
+        size = (total + 7) // 8
+        buffers = {}
+        inverse_norms = array('d')
+        for doc_id, grams in enumerate(doc_grams):
+            weights = {g: (1.0 + math.log(c)) * self.idf[g] for g, c in grams.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            inverse_norms.append(1.0 / norm)
+            for g, w in weights.items():
+                if g in common:
+                    buffer = buffers.setdefault((g, grams[g]), bytearray(size))
+                    buffer[doc_id >> 3] |= 1 << (doc_id & 7)
+                else:
+                    self.postings[g].append((doc_id, w / norm))
+                self.doc_grams.append(self.gram_ids[g])
+                self.doc_weights.append(w / norm)
+            self.offsets.append(len(self.doc_grams))
+        bitmaps = defaultdict(list)
+        for (g, count), buffer in buffers.items():
+            bitmaps[g].append(((1.0 + math.log(count)) * self.idf[g], int.from_bytes(buffer, "little")))
+        self.bitmaps = dict(bitmaps)
+
+        # Norm buckets: (largest inverse norm in the bucket, bitmap of its docs)
+        top_inverse_norm = max(inverse_norms, default=1.0)
+        step = math.log(NORM_BUCKET_RATIO)
+        buckets = defaultdict(lambda: bytearray(size))
+        for doc_id, inverse_norm in enumerate(inverse_norms):
+            buckets[int(math.log(top_inverse_norm / inverse_norm) / step)][doc_id >> 3] |= 1 << (doc_id & 7)
+        # The small margin keeps each edge above its docs' values despite rounding
+        self.norm_buckets = [
+            (top_inverse_norm / NORM_BUCKET_RATIO ** b * (1 + 1e-9), int.from_bytes(buffer, "little"))
+            for b, buffer in sorted(buckets.items())
+        ]
+        self.all_docs = (1 << total) - 1
+
+    def __len__(self) -> int:
+        return len(self.descriptions)
+
+    def score(self, doc_id: int, query_weights: Dict[int, float]) -> float:
+        """Cosine similarity between a product and L2-normalized query weights keyed by gram id."""
+        start, end = self.offsets[doc_id], self.offsets[doc_id + 1]
+        get = query_weights.get
+        return sum(w * get(g, 0.0) for g, w in zip(self.doc_grams[start:end], self.doc_weights[start:end]))
+
+    def weighted_sums(self, weighted_bitmaps: List[tuple]) -> List[int]:
+        """Sum integer weights over bitmaps per doc, as a bit-sliced binary number (slices[i] holds bit i)."""
+        slices = []
+        for units, bits in weighted_bitmaps:
+            position = 0
+            while units:
+                if units & 1:
+                    # Add the bitmap at this bit position, rippling carries upwards
+                    carry, i = bits, position
+                    while carry:
+                        if i >= len(slices):
+                            slices.extend([0] * (i - len(slices)))
+                            slices.append(carry)
+                            break
+                        slices[i], carry = slices[i] ^ carry, slices[i] & carry
+                        i += 1
+                units >>= 1
+                position += 1
+        return slices
+
+    def at_least(self, slices: List[int], threshold: int) -> int:
+        """Bitmap of the docs whose bit-sliced sum is at least `threshold`."""
+        if threshold <= 0:
+            return self.all_docs
+        if threshold >> len(slices):
+            return 0
+        greater, equal = 0, self.all_docs
+        for i in reversed(range(len(slices))):
+            if threshold >> i & 1:
+                equal &= slices[i]
+            else:
+                greater |= equal & slices[i]
+                equal &= ~slices[i]
+        return greater | equal
+
+    def bounded_above(self, sums: List[int], bound: float) -> int:
+        """Bitmap of the docs whose bit-sliced sum times their norm bucket's inverse norm exceeds `bound`."""
+        bitmap = 0
+        for inverse_norm, bits in self.norm_buckets:
+            bitmap |= self.at_least(sums, math.floor(bound / inverse_norm) + 1) & bits
+        return bitmap
+
+    def doc_ids(self, bitmap: int) -> List[int]:
+        """List the docs set in a bitmap."""
+        ids = []
+        for index, value in enumerate(bitmap.to_bytes((len(self.descriptions) + 7) // 8, "little")):
+            if value:
+                base = index << 3
+                ids.extend(base + bit for bit in BYTE_BITS[value])
+        return ids
+
+    def match(self, query: str, limit: int = 5) -> List[Dict]:
+        """Return the top `limit` products for a query as {match, score} dicts (score 0-100)."""
+        grams = char_ngrams(query)
+        weights = {g: (1.0 + math.log(c)) * self.idf.get(g, self.unseen_idf) for g, c in grams.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+
+        # Rare grams are scored exactly through their (short) posting lists
+        scores = defaultdict(float)
+        common = []
+        for g, w in weights.items():
+            levels = self.bitmaps.get(g)
+            if levels is not None:
+                common.extend((w / norm * doc_weight, bits) for doc_weight, bits in levels)
+                continue
+            qw = w / norm
+            for doc_id, dw in self.postings.get(g, ()):
+                scores[doc_id] += qw * dw
+        if common:
+            top = self.match_common(scores, common, weights, norm, limit)
+        else:
+            top = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+        return [
+            {"match": self.descriptions[doc_id], "score": round(min(score, 1.0) * 100, 2)}
+            for doc_id, score in top
+        ]
+
+    def match_common(self, scores: Dict[int, float], common: List[tuple], weights: Dict[str, float],
+                     norm: float, limit: int) -> List[tuple]:
+        """Find the exact top `limit` (doc, score) pairs for a query that has common grams.
+
+        `scores` holds the rare grams' part of each score and `common` the common grams' bitmaps with
+        their unnormalized query x doc weights. A pool of likely matches is scored in full, then every
+        doc whose upper bound could still beat the pool's `limit`-th score is scored too.
+        """
+        by_id = {self.gram_ids[g]: w / norm for g, w in weights.items() if g in self.gram_ids}
+        scale = WEIGHT_STEPS / max(weight for weight, _ in common)
+        # Rounded up, so a doc's sum bounds its common grams' weight
+        sums = self.weighted_sums([(math.ceil(weight * scale), bits) for weight, bits in common])
+        wanted = limit * CANDIDATES_PER_MATCH
+
+        # Pool: the best rare-gram partial scores, plus about `wanted` docs with the highest common-gram
+        # bounds (found by bisecting the bound), scored in full
+        ranked = heapq.nlargest(wanted, scores.items(), key=itemgetter(1))
+        pool = {doc_id for doc_id, _ in ranked}
+        rare_bound = ranked[-1][1] if len(ranked) == wanted and len(scores) > wanted else 0.0
+        low, high = 0.0, sum(math.ceil(weight * scale) for weight, _ in common) * self.norm_buckets[0][0]
+        for _ in range(POOL_BISECTIONS):
+            middle = (low + high) / 2
+            if self.bounded_above(sums, middle).bit_count() >= wanted:
+                low = middle
+            else:
+                high = middle
+        pool.update(self.doc_ids(self.bounded_above(sums, low))[:wanted])
+        top = heapq.nlargest(limit, ((d, self.score(d, by_id)) for d in sorted(pool)), key=itemgetter(1))
+
+        # A doc outside the pool scores at most rare_bound plus its common-gram bound, so score every
+        # doc where that could beat the current limit-th score
+        kth = top[-1][1] if len(top) == limit else 0.0
+        rest = [d for d in self.doc_ids(self.bounded_above(sums, (kth - rare_bound) * scale)) if d not in pool]
+        if rest:
+            top = heapq.nlargest(limit, top + [(d, self.score(d, by_id)) for d in rest], key=itemgetter(1))
+        return top
+
+    def match_batch(self, queries: List[str], limit: int = 5) -> Dict[str, List[Dict]]:
+        """Match several queries, returning the same shape as the /match/batch API."""
+        return {q: self.match(q, limit) for q in dict.fromkeys(queries)}
+
+_matcher: ProductMatcher | None = None
+_lock = threading.Lock()
+
+def build_index() -> ProductMatcher:
+    """Build the matching index from the current product catalog, unless it is already built."""
+    global _matcher
+    with _lock:
+        # Another caller may have built it while this one waited for the lock
+        if _matcher is not None:
+            return _matcher
+        with SessionLocal() as db:
+            descriptions = db.execute(
+                select(Product.description).order_by(Product.id)
+            ).scalars().all()
+        _matcher = ProductMatcher(list(descriptions))
+        logger.info(f"Built local matching index over {len(_matcher)} products")
+        return _matcher
+
+def get_matcher() -> ProductMatcher:
+    """Return the matching index, building it on first use."""
+    matcher = _matcher
+    if matcher is None:
+        matcher = build_index()
+    return matcher
+
+def invalidate_index():
+    """Drop the matching index so it is rebuilt from the reloaded catalog."""
+    global _matcher
+    with _lock:
+        _matcher = None
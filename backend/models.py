@@ -1,16 +1,7 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text, Boolean, Index, LargeBinary, func, inspect, text
+from sqlalchemy.schema import CreateTable
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
-import os
-
-# Create database directory if it doesn't exist
-os.makedirs('db', exist_ok=True)
-
-# Database setup
-DATABASE_URL = "sqlite:///db/orders.db"
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-db_session = SessionLocal()
+from sqlalchemy.orm import relationship
 
 Base = declarative_base()
 
@@ -33,16 +24,26 @@ class Order(Base):
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, unique=True, index=True)
     status = Column(String)  # 'processing', 'needs_review', 'completed', 'error'
+    content_hash = Column(String, nullable=True, index=True)  # SHA-256 of the uploaded PDF
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     line_items = relationship("LineItem", back_populates="order", cascade="all, delete-orphan")
+    jobs = relationship("Job", back_populates="order", cascade="all, delete-orphan")
+
+    # Keyset pagination of the order list, optionally filtered by status.
+    # Ids are never reused, so work still running for a deleted order can't touch its replacement.
+    __table_args__ = (
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_status_created_at_id", "status", "created_at", "id"),
+        {"sqlite_autoincrement": True},
+    )
 
 class LineItem(Base):
     __tablename__ = "line_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
     extracted_text = Column(String)
     matched_product_id = Column(Integer, ForeignKey("products.id"), nullable=True)
     confidence_score = Column(Float)
@@ -51,5 +52,119 @@ class LineItem(Base):
     order = relationship("Order", back_populates="line_items")
     matched_product = relationship("Product")
 
-# Create all tables
-Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), index=True)
+    file_path = Column(String)
+    filename = Column(String)
+    status = Column(String, index=True)  # 'queued', 'running', 'done', 'failed'
+    priority = Column(Integer, default=0)
+    force_extract = Column(Boolean, default=False)
+    attempts = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    next_run_at = Column(DateTime, server_default=func.now())
+    created_at = Column(DateTime, server_default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    claimed_by = Column(String, nullable=True)  # Worker running the job, see jobs.worker_id
+    lease_expires_at = Column(DateTime, nullable=True)  # Running jobs are claimed again once this passes
+
+    order = relationship("Order", back_populates="jobs")
+
+    __table_args__ = {"sqlite_autoincrement": True}
+
+class ExtractionCacheEntry(Base):
+    __tablename__ = "extraction_cache"
+
+    content_hash = Column(String, primary_key=True)  # SHA-256 of the PDF bytes
+    result = Column(Text)  # JSON-encoded extraction API response
+    size = Column(Integer)
+    created_at = Column(DateTime, server_default=func.now())
+    last_used_at = Column(DateTime, server_default=func.now(), index=True)
+
+class ArchivedOrder(Base):
+    __tablename__ = "archived_orders"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, index=True)  # Id of the order before it was archived
+    filename = Column(String, index=True)
+    status = Column(String)
+    content_hash = Column(String, nullable=True)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, server_default=func.now(), index=True)
+    line_item_count = Column(Integer)
+    line_items = Column(LargeBinary)  # zlib-compressed JSON rows, see retention.pack_line_items
+
+def add_missing_columns(bind):
+    """Add nullable columns introduced after a table was first created."""
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=bind.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+def tables_missing_autoincrement(bind) -> list:
+    """Return existing tables declared AUTOINCREMENT that were created without it."""
+    with bind.connect() as conn:
+        created = dict(conn.execute(text("SELECT name, sql FROM sqlite_master WHERE type = 'table'")).all())
+    return [
+        table for table in Base.metadata.sorted_tables
+        if table.dialect_options["sqlite"]["autoincrement"]
+        and table.name in created and "AUTOINCREMENT" not in created[table.name].upper()
+    ]
+
+def add_autoincrement(bind):
+    """Rebuild tables created before they were declared AUTOINCREMENT, keeping their rows and ids.
+
+    Dropping the old table also drops its indexes and triggers, which are recreated afterwards.
+    """
+    for table in tables_missing_autoincrement(bind):
+        rebuilt = f"{table.name}_rebuild"
+        create = str(CreateTable(table).compile(dialect=bind.dialect))
+        create = create.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {rebuilt} ", 1)
+        columns = ", ".join(column.name for column in table.columns)
+        with bind.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {rebuilt}"))
+            conn.execute(text(create))
+            conn.execute(text(f"INSERT INTO {rebuilt} ({columns}) SELECT {columns} FROM {table.name}"))
+            conn.execute(text(f"DROP TABLE {table.name}"))
+            conn.execute(text(f"ALTER TABLE {rebuilt} RENAME TO {table.name}"))
+
+def schema_is_current(bind) -> bool:
+    """Check whether every table, column and index in the models already exists."""
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            return False
+        columns = {c["name"] for c in inspector.get_columns(table.name)}
+        if any(column.name not in columns for column in table.columns):
+            return False
+        indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        if any(index.name not in indexes for index in table.indexes):
+            return False
+    return not tables_missing_autoincrement(bind)
+
+def create_schema(bind) -> bool:
+    """Create missing tables, and columns, indexes and AUTOINCREMENT added to tables that already exist.
+
+    Returns False without touching the database when the schema is already current.
+    """
+    if schema_is_current(bind):
+        return False
+    Base.metadata.create_all(bind=bind)
+    add_missing_columns(bind)
+    add_autoincrement(bind)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+    return True
+ 
\ No newline at end of file
@@ -0,0 +1,144 @@
+import asyncio
+import importlib.util
+import io
+import logging
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+import blobs
+import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Header cells that mark the item description and quantity columns of a line item table
+ITEM_HEADER = re.compile(r"\b(?:item|description|product)\b", re.IGNORECASE)
+QUANTITY_HEADER = re.compile(r"\b(?:amount|qty|quantity)\b", re.IGNORECASE)
+TABLE_END = re.compile(r"^\s*(?:sub\s*total|total|grand\s+total)\b", re.IGNORECASE)
+QUANTITY = re.compile(r"^\d{1,3}(?:,\d{3})*$|^\d+$")
+# Pages with less extractable text than this are treated as scanned
+MIN_TEXT_CHARS = 20
+
+_pool: ProcessPoolExecutor | None = None
+_available: bool | None = None
+
+def is_available() -> bool:
+    """Whether the optional 'pypdf' package needed for local extraction is installed."""
+    global _available
+    if _available is None:
+        _available = importlib.util.find_spec("pypdf") is not None
+        if not _available:
+            logger.warning("The 'pypdf' package is not installed, extracting all PDFs with the extraction API")
+    return _available
+
+def find_columns(line: str) -> tuple | None:
+    """Return the (start, end) character span of the quantity column if this is a table header."""
+    item = ITEM_HEADER.search(line)
+    quantity = QUANTITY_HEADER.search(line)
+    if not item or not quantity or quantity.start() < item.end():
+        return None
+    # The quantity column runs until the next header cell (e.g. "Unit Price")
+    following = re.search(r"\s{2,}\S", line[quantity.end():])
+    end = quantity.end() + following.end() - 1 if following else None
+    return quantity.start(), end
+
+def parse_table(pages: List[str]) -> Dict:
+    """Parse line items from the layout text of each page, scoring how cleanly the table parsed."""
+    items = []
+    anomalies = 0
+    columns = None
+    table_ended = False
+    for text in pages:
+        lines = text.splitlines()
+        headers = [i for i, line in enumerate(lines) if find_columns(line)]
+        if headers:
+            # Parse from the page's own header, skipping the preamble above it
+            columns = find_columns(lines[headers[0]])
+            lines = lines[headers[0] + 1:]
+            table_ended = False
+        elif columns is None or table_ended:
+            continue
+        # Otherwise this is a continuation page that reuses the previous header's columns
+
+        pending = []
+        for line in lines:
+            if not line.strip():
+                continue
+            header = find_columns(line)
+            if header:
+                columns = header
+                pending = []
+                continue
+            if TABLE_END.match(line):
+                table_ended = True
+                break
+
+            start, end = columns
+            description = " ".join(line[:start].split())
+            quantity = line[start:end].strip()
+            if not quantity:
+                if description:
+                    # Descriptions that wrap put the quantity on their last line
+                    pending.append(description)
+                continue
+            if not QUANTITY.match(quantity):
+                anomalies += 1
+                pending = []
+                continue
+            description = " ".join(pending + [description]).strip()
+            pending = []
+            if not description:
+                anomalies += 1
+                continue
+            items.append({"Request Item": description, "Amount": int(quantity.replace(",", ""))})
+        if pending:
+            # Text left over after the last quantity, e.g. notes below the table or a misread row
+            anomalies += 1
+
+    if columns is None:
+        return {"items": [], "confidence": 0.0, "reason": "no line item table header"}
+    if not items:
+        return {"items": [], "confidence": 0.0, "reason": "no line items"}
+    return {
+        "items": items,
+        "confidence": round(len(items) / (len(items) + anomalies), 3),
+        "reason": f"{anomalies} unparsed rows" if anomalies else "ok",
+    }
+
+def extract_text_layer(file_path: str) -> Dict:
+    """Extract line items from the PDF's embedded text layer (runs in a worker process)."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(blobs.read_blob(file_path)))
+    pages = [page.extract_text(extraction_mode="layout") or "" for page in reader.pages]
+    if sum(len("".join(text.split())) for text in pages) < MIN_TEXT_CHARS * len(pages):
+        return {"items": [], "confidence": 0.0, "reason": "no text layer"}
+    return parse_table(pages)
+
+def get_pool() -> ProcessPoolExecutor:
+    """Return the extraction process pool, starting it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=config.LOCAL_EXTRACTION_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.info(f"Started {config.LOCAL_EXTRACTION_PROCESSES} local extraction processes")
+    return _pool
+
+def stop_pool():
+    """Shut down the extraction process pool."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+async def extract_local(file_path: str) -> Dict:
+    """Parse the PDF's text layer off the event loop."""
+    if multiprocessing.parent_process() is not None:
+        # Already in a job worker process, so there's no API event loop to keep free
+        return await asyncio.to_thread(extract_text_layer, file_path)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), extract_text_layer, file_path)
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import logging
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+from database import SessionLocal
+from models import ArchivedOrder, Job, LineItem, Order
+from sqlalchemy import select, insert, delete, func
+from sqlalchemy.orm import Session
+import blobs
+import config
+import events
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Line item columns kept in the archive; ids are reassigned on restore
+ARCHIVED_LINE_ITEM_COLUMNS = ["extracted_text", "matched_product_id", "confidence_score", "quantity"]
+
+class RestoreConflict(Exception):
+    """Raised when an archived order can't be restored because its filename is in use again."""
+
+def pack_line_items(rows: List[tuple]) -> bytes:
+    """Encode line item rows (in ARCHIVED_LINE_ITEM_COLUMNS order) as compressed JSON."""
+    return zlib.compress(json.dumps(rows, separators=(",", ":")).encode())
+
+def unpack_line_items(data: bytes) -> List[Dict]:
+    """Decode rows packed by pack_line_items into LineItem column dicts."""
+    return [dict(zip(ARCHIVED_LINE_ITEM_COLUMNS, row)) for row in json.loads(zlib.decompress(data))]
+
+def archived_order_to_dict(archived: ArchivedOrder) -> Dict:
+    """Summarize an archived order without unpacking its line items."""
+    return {
+        "id": archived.id,
+        "order_id": archived.order_id,
+        "filename": archived.filename,
+        "status": archived.status,
+        "line_items": archived.line_item_count,
+        "created_at": archived.created_at,
+        "updated_at": archived.updated_at,
+        "archived_at": archived.archived_at,
+    }
+
+def archive_orders(db: Session, older_than_days: float, batch_size: int | None = None) -> int:
+    """Move completed orders not updated for `older_than_days` into the archive, batch by batch."""
+    batch_size = batch_size or config.RETENTION_BATCH_SIZE
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=older_than_days)
+    archived = 0
+    while True:
+        orders = db.execute(
+            select(Order.id, Order.filename, Order.status, Order.content_hash, Order.created_at, Order.updated_at)
+            .where(Order.status == 'completed', Order.updated_at < cutoff)
+            .order_by(Order.id)
+            .limit(batch_size)
+        ).all()
+        if not orders:
+            break
+        order_ids = [o.id for o in orders]
+
+        rows_by_order = defaultdict(list)
+        for order_id, *row in db.execute(
+            select(LineItem.order_id, *(getattr(LineItem, c) for c in ARCHIVED_LINE_ITEM_COLUMNS))
+            .where(LineItem.order_id.in_(order_ids))
+            .order_by(LineItem.order_id, LineItem.id)
+        ):
+            rows_by_order[order_id].append(row)
+
+        db.execute(insert(ArchivedOrder), [
+            {
+                "order_id": o.id,
+                "filename": o.filename,
+                "status": o.status,
+                "content_hash": o.content_hash,
+                "created_at": o.created_at,
+                "updated_at": o.updated_at,
+                "line_item_count": len(rows_by_order[o.id]),
+                "line_items": pack_line_items(rows_by_order[o.id]),
+            }
+            for o in orders
+        ])
+        db.execute(delete(LineItem).where(LineItem.order_id.in_(order_ids)))
+        db.execute(delete(Job).where(Job.order_id.in_(order_ids)))
+        db.execute(delete(Order).where(Order.id.in_(order_ids)))
+        db.commit()
+
+        # Archived orders disappear from live order lists
+        for order_id in order_ids:
+            events.publish("order_deleted", order_id, {"id": order_id, "archived": True})
+        archived += len(order_ids)
+        if len(order_ids) < batch_size:
+            break
+    if archived:
+        logger.info(f"Archived {archived} completed orders older than {older_than_days:g} days")
+    return archived
+
+def restore_order(db: Session, archive_id: int) -> Order | None:
+    """Move an archived order and its line items back into the live tables."""
+    archived = db.get(ArchivedOrder, archive_id)
+    if archived is None:
+        return None
+    if db.execute(select(Order.id).where(Order.filename == archived.filename)).first():
+        raise RestoreConflict(f"An order named {archived.filename} already exists")
+
+    # Keep the original id unless a newer order has taken it
+    order_id = archived.order_id if db.get(Order, archived.order_id) is None else None
+    # updated_at is reset so the next retention run doesn't archive the order straight away.
+    # created_at is written through SQLite's datetime() to match the CURRENT_TIMESTAMP format
+    # (no fraction) of other orders, which the order list's keyset cursor relies on.
+    order = Order(
+        id=order_id,
+        filename=archived.filename,
+        status=archived.status,
+        content_hash=archived.content_hash,
+        created_at=func.datetime(archived.created_at.strftime("%Y-%m-%d %H:%M:%S"))
+    )
+    db.add(order)
+    db.flush()
+    line_items = unpack_line_items(archived.line_items)
+    if line_items:
+        db.execute(insert(LineItem), [{"order_id": order.id, **item} for item in line_items])
+    db.delete(archived)
+    db.commit()
+    logger.info(f"Restored archived order {archive_id} as order {order.id} ({len(line_items)} line items)")
+    events.publish_order(order)
+    return order
+
+def collect_uploads(db: Session) -> Dict:
+    """Delete stored uploads that no live order refers to any more."""
+    referenced = set(db.execute(
+        select(Order.content_hash).where(Order.content_hash.is_not(None)).distinct()
+    ).scalars())
+    return blobs.collect_garbage(referenced, config.UPLOAD_GC_GRACE)
+
+def run_retention(older_than_days: float | None = None) -> Dict:
+    """Archive old completed orders (if a retention period is set), then remove uploads left unreferenced."""
+    older_than_days = config.RETENTION_DAYS if older_than_days is None else older_than_days
+    with SessionLocal() as db:
+        archived = archive_orders(db, older_than_days) if older_than_days > 0 else 0
+        uploads = collect_uploads(db)
+        total_archived = db.execute(select(func.count()).select_from(ArchivedOrder)).scalar_one()
+    return {"archived": archived, "archived_total": total_archived, "uploads": uploads}
+
+async def run_periodically():
+    """Apply the retention policy and collect unreferenced uploads every RETENTION_INTERVAL seconds."""
+    while True:
+        try:
+            await asyncio.to_thread(run_retention)
+        except Exception as e:
+            logger.error(f"Retention run failed: {str(e)}")
+        await asyncio.sleep(config.RETENTION_INTERVAL)
@@ -0,0 +1,113 @@
+import logging
+import re
+from typing import List
+from models import Product
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Keep size/thread tokens such as "1/4-20" or "#10-24" intact
+TOKEN_CHARS = "-/#."
+TOKEN_PATTERN = re.compile(r"[\w\-/#.]+")
+# Prefix lengths FTS5 indexes directly, so the first keystrokes don't expand into thousands of terms
+PREFIX_INDEX = "1 2 3"
+# Broad prefixes match most of the catalog and ranking every match costs tens of milliseconds,
+# so only the first matches (in product id order) are ranked by BM25
+RANK_CANDIDATES = 500
+
+SEARCH_INDEX_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        description,
+        content='products',
+        content_rowid='id',
+        tokenize="unicode61 tokenchars '{TOKEN_CHARS}'",
+        prefix='{PREFIX_INDEX}'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, description) VALUES ('delete', old.id, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, description) VALUES ('delete', old.id, old.description);
+        INSERT INTO products_fts(rowid, description) VALUES (new.id, new.description);
+    END
+    """,
+]
+
+_fts_available = True
+
+def ensure_search_index(engine):
+    """Create the FTS5 product index and its sync triggers if they don't exist yet."""
+    global _fts_available
+    try:
+        with engine.begin() as conn:
+            existing_sql = conn.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'")
+            ).scalar()
+            if existing_sql and "prefix=" not in existing_sql:
+                # Created before the prefix indexes were added; the content lives in products
+                conn.execute(text("DROP TABLE products_fts"))
+                existing_sql = None
+            for ddl in SEARCH_INDEX_DDL:
+                conn.execute(text(ddl))
+            if not existing_sql:
+                # Index products that were loaded before the FTS table existed
+                conn.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+                logger.info("Built full-text product search index")
+        _fts_available = True
+    except OperationalError as e:
+        logger.warning(f"FTS5 unavailable, falling back to LIKE search: {str(e)}")
+        _fts_available = False
+
+def drop_search_index(engine):
+    """Drop the FTS5 product index (its triggers are dropped with the products table)."""
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS products_fts"))
+
+def build_match_query(q: str) -> str:
+    """Turn free text into an FTS5 query: every token must match as a prefix, in any order.
+
+    Sizes are indexed whole (e.g. "1/4-20"), so "1/4 hex" needs "1/4" to be a prefix too.
+    """
+    return " ".join(f'"{t}"*' for t in TOKEN_PATTERN.findall(q.lower()))
+
+def search_products(db: Session, q: str, limit: int = 10, offset: int = 0) -> List[Product]:
+    """Search products by description, ranked by BM25 relevance among the first RANK_CANDIDATES matches."""
+    match_query = build_match_query(q)
+    if not match_query:
+        return []
+
+    if not _fts_available:
+        stmt = select(Product).where(Product.description.ilike(f"%{q}%")).limit(limit).offset(offset)
+        return db.execute(stmt).scalars().all()
+
+    stmt = select(Product).from_statement(
+        text(
+            "SELECT products.* FROM ("
+            "    SELECT rowid, rank FROM products_fts WHERE products_fts MATCH :q LIMIT :candidates"
+            ") AS hits "
+            "JOIN products ON products.id = hits.rowid "
+            "ORDER BY hits.rank "
+            "LIMIT :limit OFFSET :offset"
+        )
+    )
+    params = {
+        "q": match_query,
+        "candidates": max(RANK_CANDIDATES, offset + limit),
+        "limit": limit,
+        "offset": offset,
+    }
+    return db.execute(stmt, params).scalars().all()
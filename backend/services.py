@@ -1,117 +1,328 @@
-import httpx
+import asyncio
 import os
+import random
+import time
 from typing import List, Dict
-from models import Order, LineItem, Product, db_session
-from sqlalchemy import select
+from database import SessionLocal
+from models import Order, LineItem
+from sqlalchemy import insert, delete, update
+from sqlalchemy.orm import Session
 import logging
+import blobs
+import catalog
+import config
+import events
+import extraction_cache
+import http_client
+import match_cache
+import matching
+import metrics
+import pdf_extraction
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-EXTRACTION_API_URL = "https://plankton-app-qajlk.ondigitalocean.app"
-MATCHING_API_URL = "https://endeavor-interview-api-gzwki.ondigitalocean.app"
+class OrderDeleted(Exception):
+    """Raised when an order is deleted (e.g. replaced by a new upload) while it is being processed."""
+
+def log_response(label: str, response):
+    """Log an upstream response body at debug level, or for a configured sample of calls."""
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"{label} response: {response.text}")
+    elif config.RESPONSE_LOG_SAMPLE_RATE > 0 and random.random() < config.RESPONSE_LOG_SAMPLE_RATE:
+        logger.info(f"{label} response (sampled): {response.text}")
 
 async def extract_from_pdf(file_path: str) -> List[Dict]:
     """Extract line items from PDF using the extraction API."""
-    async with httpx.AsyncClient() as client:
-        with open(file_path, 'rb') as f:
-            files = {'file': (os.path.basename(file_path), f, 'application/pdf')}
-            response = await client.post(
-                f"{EXTRACTION_API_URL}/extraction_api",
-                files=files
-            )
-            if response.status_code != 200:
-                raise Exception(f'Extraction failed: {response.text}')
-            
-            logger.info(f"Extraction response: {response.text}")
-            return response.json()
-
-def find_product_by_description(description: str) -> Product | None:
-    """Find a product by its exact description."""
-    stmt = select(Product).where(Product.description == description)
-    return db_session.execute(stmt).scalar_one_or_none()
+    client = http_client.get_client()
+    # Stored uploads may be compressed, so send the original bytes rather than the file on disk
+    content = await asyncio.to_thread(blobs.read_blob, file_path)
+    async with http_client.get_semaphore():
+        files = {'file': (os.path.basename(file_path).removesuffix(".gz"), content, 'application/pdf')}
+        response = await client.post(
+            f"{config.EXTRACTION_API_URL}/extraction_api",
+            files=files,
+            timeout=config.EXTRACTION_TIMEOUT
+        )
+    if response.status_code != 200:
+        raise Exception(f'Extraction failed: {response.text}')
+    
+    log_response("Extraction", response)
+    return response.json()
 
-async def match_items(extracted_items: List[Dict]) -> Dict[str, List[Dict]]:
-    """Match extracted items with products using the matching API."""
-    # Extract just the item descriptions for matching
-    item_descriptions = [item["Request Item"] for item in extracted_items]
-    logger.info(f"Sending items for matching: {item_descriptions}")
+async def extract_pdf(file_path: str) -> List[Dict]:
+    """Extract line items using the configured extraction mode."""
+    if config.EXTRACTION_MODE == "remote" or not pdf_extraction.is_available():
+        metrics.EXTRACTIONS.inc(source="remote")
+        return await extract_from_pdf(file_path)
     
-    async with httpx.AsyncClient() as client:
+    try:
+        with metrics.stage("local_extraction"):
+            result = await pdf_extraction.extract_local(file_path)
+    except Exception as e:
+        if config.EXTRACTION_MODE == "local":
+            raise
+        logger.warning(f"Local extraction failed for {os.path.basename(file_path)}: {str(e)}")
+        result = {"items": [], "confidence": 0.0, "reason": "error"}
+    if config.EXTRACTION_MODE == "local" or result["confidence"] >= config.LOCAL_EXTRACTION_MIN_CONFIDENCE:
+        logger.info(f"Extracted {len(result['items'])} items locally from {os.path.basename(file_path)} "
+                    f"(confidence {result['confidence']})")
+        metrics.EXTRACTIONS.inc(source="local")
+        return result["items"]
+    
+    # local_first: scanned or unrecognized layouts go to the extraction API
+    logger.info(f"Falling back to remote extraction for {os.path.basename(file_path)} "
+                f"(local confidence {result['confidence']}: {result['reason']})")
+    metrics.EXTRACTIONS.inc(source="remote")
+    return await extract_from_pdf(file_path)
+
+async def match_items_remote(item_descriptions: List[str]) -> Dict[str, List[Dict]]:
+    """Match item descriptions with products using the remote matching API."""
+    client = http_client.get_client()
+    async with http_client.get_semaphore():
         response = await client.post(
-            f"{MATCHING_API_URL}/match/batch",
-            params={"limit": 5},
-            json={"queries": item_descriptions}
+            f"{config.MATCHING_API_URL}/match/batch",
+            params={"limit": config.MATCH_LIMIT},
+            json={"queries": item_descriptions},
+            timeout=config.MATCHING_TIMEOUT
         )
-        if response.status_code != 200:
-            raise Exception(f'Matching failed: {response.text}')
-        
-        logger.info(f"Matching response: {response.text}")
-        return response.json()['results']
+    if response.status_code != 200:
+        raise Exception(f'Matching failed: {response.text}')
+    
+    log_response("Matching", response)
+    return response.json()['results']
+
+async def match_items_local(item_descriptions: List[str]) -> Dict[str, List[Dict]]:
+    """Match item descriptions with products using the in-process index."""
+    # get_matcher may have to (re)build the index, so it runs off the event loop too
+    return await asyncio.to_thread(
+        lambda: matching.get_matcher().match_batch(item_descriptions, config.MATCH_LIMIT)
+    )
+
+async def match_queries(item_descriptions: List[str]) -> Dict[str, List[Dict]]:
+    """Match item descriptions with products using the configured matching mode."""
+    if config.MATCHING_MODE == "remote":
+        return await match_items_remote(item_descriptions)
+    
+    results = await match_items_local(item_descriptions)
+    if config.MATCHING_MODE == "local":
+        return results
+    
+    # local_first: only send low-confidence items to the remote API
+    fallback = [
+        q for q in dict.fromkeys(item_descriptions)
+        if not results.get(q) or results[q][0]["score"] < config.LOCAL_MATCH_MIN_SCORE
+    ]
+    if fallback:
+        logger.info(f"Falling back to remote matching for {len(fallback)} items")
+        try:
+            results.update(await match_items_remote(fallback))
+        except Exception as e:
+            logger.warning(f"Remote matching failed, keeping local matches: {str(e)}")
+    return results
+
+async def match_items(extracted_items: List[Dict]) -> Dict[str, List[Dict]]:
+    """Match extracted items with products, only sending uncached items to the matcher."""
+    # Extract just the unique item descriptions for matching
+    queries = list(dict.fromkeys(item["Request Item"] for item in extracted_items))
+    if not config.MATCH_CACHE_ENABLED:
+        logger.info(f"Sending {len(queries)} items for matching ({config.MATCHING_MODE})")
+        with metrics.stage("matching"):
+            return await match_queries(queries)
+    
+    cached = match_cache.get_many(queries)
+    misses = [q for q in queries if q not in cached]
+    metrics.CACHE_LOOKUPS.inc(len(cached), cache="match", result="hit")
+    metrics.CACHE_LOOKUPS.inc(len(misses), cache="match", result="miss")
+    fresh = {}
+    if misses:
+        logger.info(f"Sending {len(misses)} uncached items for matching ({config.MATCHING_MODE})")
+        logger.debug(f"Uncached items: {misses}")
+        generation = match_cache.generation()
+        start = time.perf_counter()
+        with metrics.stage("matching"):
+            fresh = await match_queries(misses)
+        match_cache.record_fetch(time.perf_counter() - start, len(misses))
+        match_cache.put_many(fresh, generation)
+    logger.info(f"Matched {len(queries)} items ({len(cached)} from cache)")
+    
+    # Merge cached and fresh results in the original item order
+    return {q: cached[q] if q in cached else fresh.get(q, []) for q in queries}
+
+def run_in_session(func, *args):
+    """Call func(db, *args) with a session of its own, for database work run in a thread."""
+    with SessionLocal() as db:
+        return func(db, *args)
 
-async def process_order(file_path: str, filename: str) -> Order:
-    """Process an uploaded order file."""
-    # Initialize order variable in outer scope
-    order = None
+async def extract_items(file_path: str, force_extract: bool = False,
+                        content_hash: str | None = None) -> List[Dict]:
+    """Extract line items, reusing the cached result for previously seen PDF content."""
+    if not config.EXTRACTION_CACHE_ENABLED:
+        with metrics.stage("extraction"):
+            return await extract_pdf(file_path)
     
+    if content_hash is None:
+        content_hash = await asyncio.to_thread(extraction_cache.file_sha256, file_path)
+    if not force_extract:
+        cached_items = await asyncio.to_thread(run_in_session, extraction_cache.get, content_hash)
+        if cached_items is not None:
+            metrics.CACHE_LOOKUPS.inc(cache="extraction", result="hit")
+            logger.info(f"Using cached extraction for {os.path.basename(file_path)} ({content_hash[:12]})")
+            return cached_items
+        metrics.CACHE_LOOKUPS.inc(cache="extraction", result="miss")
+    
+    with metrics.stage("extraction"):
+        extracted_items = await extract_pdf(file_path)
+    await asyncio.to_thread(run_in_session, extraction_cache.put, content_hash, extracted_items)
+    return extracted_items
+
+def plan_match_chunks(extracted_items: List[Dict], chunk_size: int) -> List[tuple]:
+    """Split line items into consecutive chunks, pairing each with the items whose text first appears in it."""
+    seen = set()
+    chunks = []
+    for start in range(0, len(extracted_items), max(chunk_size, 1)):
+        items = extracted_items[start:start + chunk_size]
+        new_items = []
+        for item in items:
+            if item["Request Item"] not in seen:
+                seen.add(item["Request Item"])
+                new_items.append(item)
+        chunks.append((items, new_items))
+    return chunks
+
+def build_line_items(db: Session, order_id: int, items: List[Dict], matches_by_query: Dict[str, List[Dict]]) -> List[Dict]:
+    """Turn extracted items and their matches into LineItem rows."""
+    # Resolve all best-match descriptions to product ids at once
+    best_matches = {}
+    for item_data in items:
+        item_matches = matches_by_query.get(item_data["Request Item"])
+        if item_matches:
+            best_matches[item_data["Request Item"]] = item_matches[0]
+    with metrics.stage("product_resolution"):
+        product_ids = catalog.resolve_product_ids(db, (m["match"] for m in best_matches.values()))
+    
+    line_items = []
+    for item_data in items:
+        request_item = item_data["Request Item"]
+        best_match = best_matches.get(request_item)
+        
+        # Parse quantity from the extracted data
+        try:
+            quantity = int(item_data.get("Amount", 1))
+        except (ValueError, TypeError):
+            quantity = 1
+        
+        # Find the product ID for the best match
+        matched_product_id = None
+        if best_match:
+            matched_product_id = product_ids.get(best_match["match"])
+            if matched_product_id is None:
+                logger.warning(f"No product found in database for match: {best_match['match']}")
+        
+        line_items.append({
+            "order_id": order_id,
+            "extracted_text": request_item,
+            "matched_product_id": matched_product_id,
+            "confidence_score": best_match['score'] if best_match else 0.0,
+            "quantity": quantity
+        })
+    return line_items
+
+def set_order_status(db: Session, order_id: int, status: str) -> bool:
+    """Update an order's status by id, returning False if the order no longer exists."""
+    return db.execute(update(Order).where(Order.id == order_id).values(status=status)).rowcount > 0
+
+def save_line_items(order_id: int, items: List[Dict], matches_by_query: Dict[str, List[Dict]]) -> List[Dict]:
+    """Build and insert a chunk's line items, unless the order has been deleted meanwhile."""
+    with SessionLocal() as db:
+        line_items = build_line_items(db, order_id, items, matches_by_query)
+        with metrics.stage("db_commit"):
+            # Touching the order row first means the insert and commit only happen
+            # if the order still exists, since SQLite serializes write transactions
+            if not set_order_status(db, order_id, 'processing'):
+                raise OrderDeleted(f"Order {order_id} was deleted during processing")
+            db.execute(insert(LineItem), line_items)
+            db.commit()
+    return line_items
+
+def finish_order(order_id: int, status: str, discard_line_items: bool = False) -> Order | None:
+    """Set a processed order's final status and return it, or None if the order was deleted meanwhile."""
+    with SessionLocal() as db:
+        if discard_line_items:
+            db.execute(delete(LineItem).where(LineItem.order_id == order_id))
+        still_exists = set_order_status(db, order_id, status)
+        db.commit()
+        return db.get(Order, order_id) if still_exists else None
+
+async def process_order(order_id: int, file_path: str, force_extract: bool = False) -> Order:
+    """Process an uploaded order file.
+
+    Database work runs in threads with short-lived sessions, keeping the event loop free.
+    """
     try:
-        # Get the order first
-        stmt = select(Order).where(Order.filename == filename)
-        order = db_session.execute(stmt).scalar_one_or_none()
+        # Get the order first, by id since a re-upload replaces the order with the same filename
+        order = await asyncio.to_thread(run_in_session, Session.get, Order, order_id)
         
         if not order:
-            raise Exception("Order not found")
+            raise OrderDeleted(f"Order {order_id} not found")
         
         # Extract items from PDF
-        extracted_items = await extract_from_pdf(file_path)
+        extracted_items = await extract_items(
+            file_path, force_extract=force_extract, content_hash=order.content_hash
+        )
         logger.info(f"Extracted {len(extracted_items)} items from PDF")
+        metrics.ITEMS_EXTRACTED.inc(len(extracted_items))
+        
+        # Match chunks concurrently, bounded by the fan-out limit
+        chunks = plan_match_chunks(extracted_items, config.MATCH_CHUNK_SIZE)
+        fanout = asyncio.Semaphore(max(config.MATCH_FANOUT, 1))
         
-        # Match items with products
-        matches_by_query = await match_items(extracted_items)
-        logger.info(f"Received matches for {len(matches_by_query)} items")
+        async def match_chunk(new_items: List[Dict]) -> Dict[str, List[Dict]]:
+            if not new_items:
+                return {}
+            async with fanout:
+                return await match_items(new_items)
         
-        # Create line items
-        for item_data in extracted_items:
-            request_item = item_data["Request Item"]
-            item_matches = matches_by_query.get(request_item, [])
-            best_match = item_matches[0] if item_matches else None
-            
-            # Parse quantity from the extracted data
-            try:
-                quantity = int(item_data.get("Amount", 1))
-            except (ValueError, TypeError):
-                quantity = 1
-            
-            # Find the product ID for the best match
-            matched_product = None
-            if best_match:
-                matched_product = find_product_by_description(best_match["match"])
-                if matched_product:
-                    logger.info(f"Found product {matched_product.id} for match: {best_match['match']}")
-                else:
-                    logger.warning(f"No product found in database for match: {best_match['match']}")
-            
-            line_item = LineItem(
-                order_id=order.id,
-                extracted_text=request_item,
-                matched_product_id=matched_product.id if matched_product else None,
-                confidence_score=best_match['score'] if best_match else 0.0,
-                quantity=quantity
-            )
-            db_session.add(line_item)
-            logger.info(f"Created line item: {line_item.extracted_text} (confidence: {line_item.confidence_score})")
+        tasks = [asyncio.create_task(match_chunk(new_items)) for _, new_items in chunks]
+        try:
+            # Persist chunks in PO order as soon as each one (and those before it) is matched
+            matches_by_query = {}
+            created = matched = 0
+            for index, ((items, _), task) in enumerate(zip(chunks, tasks), start=1):
+                matches_by_query.update(await task)
+                line_items = await asyncio.to_thread(save_line_items, order_id, items, matches_by_query)
+                chunk_matched = sum(1 for i in line_items if i['matched_product_id'])
+                metrics.ITEMS_MATCHED.inc(chunk_matched, matched="true")
+                metrics.ITEMS_MATCHED.inc(len(line_items) - chunk_matched, matched="false")
+                created += len(line_items)
+                matched += chunk_matched
+                logger.info(f"Order {order_id}: saved chunk {index}/{len(chunks)} ({created}/{len(extracted_items)} line items)")
+                events.publish("line_items", order_id, {
+                    "order_id": order_id,
+                    "saved": created,
+                    "total": len(extracted_items)
+                })
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info(f"Created {created} line items ({matched} matched)")
         
         # Update order status
-        order.status = 'needs_review'
-        db_session.commit()
-        logger.info(f"Order {order.id} processed successfully")
+        with metrics.stage("db_commit"):
+            order = await asyncio.to_thread(finish_order, order_id, 'needs_review')
+        if order is None:
+            raise OrderDeleted(f"Order {order_id} was deleted during processing")
+        logger.info(f"Order {order_id} processed successfully")
+        events.publish_order(order)
         
         return order
     except Exception as e:
         logger.error(f"Error processing order: {str(e)}")
-        # If anything fails, mark the order as error
+        # If anything fails, discard partial line items and mark the order as error.
+        # This goes by id, so nothing is written if the order was deleted meanwhile.
+        order = await asyncio.to_thread(finish_order, order_id, 'error', discard_line_items=True)
         if order:
-            order.status = 'error'
-            db_session.commit()
-        raise e 
\ No newline at end of file
+            events.publish_order(order)
+        raise e
@@ -0,0 +1,144 @@
+import logging
+from typing import Dict
+from models import Order
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+import events
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Confidence scores (0-100) are counted in buckets of this width; 100 falls in the top bucket
+CONFIDENCE_BUCKET_WIDTH = 10
+CONFIDENCE_BUCKETS = 100 // CONFIDENCE_BUCKET_WIDTH
+RECENT_ORDERS_LIMIT = 5
+
+_BUCKET = f"MIN(CAST({{score}} / {CONFIDENCE_BUCKET_WIDTH} AS INTEGER), {CONFIDENCE_BUCKETS - 1})"
+
+def _count_order(row: str, delta: int) -> str:
+    return f"""
+        INSERT OR IGNORE INTO order_status_counts(status, count) VALUES ({row}.status, 0);
+        UPDATE order_status_counts SET count = count + {delta} WHERE status = {row}.status;
+    """
+
+def _count_score(row: str, delta: int) -> str:
+    bucket = _BUCKET.format(score=f"{row}.confidence_score")
+    return f"""
+        INSERT OR IGNORE INTO confidence_counts(bucket, count, score_sum) VALUES ({bucket}, 0, 0);
+        UPDATE confidence_counts
+        SET count = count + {delta}, score_sum = score_sum + {delta} * {row}.confidence_score
+        WHERE bucket = {bucket};
+    """
+
+# Aggregates are kept current by triggers, so they change in the same transaction as the rows
+AGGREGATE_TABLES_DDL = [
+    "CREATE TABLE IF NOT EXISTS order_status_counts (status TEXT PRIMARY KEY, count INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS confidence_counts (bucket INTEGER PRIMARY KEY, count INTEGER NOT NULL, score_sum REAL NOT NULL)",
+]
+
+AGGREGATE_TRIGGERS_DDL = {
+    "orders_stats_insert": f"""
+        CREATE TRIGGER orders_stats_insert AFTER INSERT ON orders BEGIN
+            {_count_order("new", 1)}
+        END
+    """,
+    "orders_stats_delete": f"""
+        CREATE TRIGGER orders_stats_delete AFTER DELETE ON orders BEGIN
+            {_count_order("old", -1)}
+        END
+    """,
+    "orders_stats_update": f"""
+        CREATE TRIGGER orders_stats_update AFTER UPDATE OF status ON orders
+        WHEN old.status IS NOT new.status BEGIN
+            {_count_order("old", -1)}
+            {_count_order("new", 1)}
+        END
+    """,
+    "line_items_stats_insert": f"""
+        CREATE TRIGGER line_items_stats_insert AFTER INSERT ON line_items
+        WHEN new.confidence_score IS NOT NULL BEGIN
+            {_count_score("new", 1)}
+        END
+    """,
+    "line_items_stats_delete": f"""
+        CREATE TRIGGER line_items_stats_delete AFTER DELETE ON line_items
+        WHEN old.confidence_score IS NOT NULL BEGIN
+            {_count_score("old", -1)}
+        END
+    """,
+    "line_items_stats_update_old": f"""
+        CREATE TRIGGER line_items_stats_update_old AFTER UPDATE OF confidence_score ON line_items
+        WHEN old.confidence_score IS NOT NULL BEGIN
+            {_count_score("old", -1)}
+        END
+    """,
+    "line_items_stats_update_new": f"""
+        CREATE TRIGGER line_items_stats_update_new AFTER UPDATE OF confidence_score ON line_items
+        WHEN new.confidence_score IS NOT NULL BEGIN
+            {_count_score("new", 1)}
+        END
+    """,
+}
+
+REBUILD_SQL = [
+    "DELETE FROM order_status_counts",
+    "INSERT INTO order_status_counts(status, count) SELECT status, COUNT(*) FROM orders GROUP BY status",
+    "DELETE FROM confidence_counts",
+    f"""
+    INSERT INTO confidence_counts(bucket, count, score_sum)
+    SELECT {_BUCKET.format(score="confidence_score")} AS bucket, COUNT(*), SUM(confidence_score)
+    FROM line_items WHERE confidence_score IS NOT NULL GROUP BY bucket
+    """,
+]
+
+def ensure_aggregates(engine):
+    """Create the aggregate tables and their triggers, recounting if any trigger was missing."""
+    with engine.begin() as conn:
+        for ddl in AGGREGATE_TABLES_DDL:
+            conn.execute(text(ddl))
+        existing = set(conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        ).scalars())
+        missing = [name for name in AGGREGATE_TRIGGERS_DDL if name not in existing]
+        for name in missing:
+            conn.execute(text(AGGREGATE_TRIGGERS_DDL[name]))
+        if missing:
+            # Counts can't be trusted if rows changed while a trigger was absent
+            for sql in REBUILD_SQL:
+                conn.execute(text(sql))
+            logger.info("Rebuilt dashboard aggregates")
+
+def get_stats(db: Session) -> Dict:
+    """Return order status counts, the confidence distribution and the latest orders."""
+    by_status = dict(db.execute(
+        text("SELECT status, count FROM order_status_counts WHERE count > 0")
+    ).all())
+    buckets = dict((bucket, (count, score_sum)) for bucket, count, score_sum in db.execute(
+        text("SELECT bucket, count, score_sum FROM confidence_counts")
+    ).all())
+    recent = db.execute(
+        select(Order).order_by(Order.created_at.desc(), Order.id.desc()).limit(RECENT_ORDERS_LIMIT)
+    ).scalars().all()
+
+    scored = sum(count for count, _ in buckets.values())
+    score_sum = sum(total for _, total in buckets.values())
+    return {
+        "orders": {
+            "total": sum(by_status.values()),
+            "by_status": {**dict.fromkeys(['processing', 'needs_review', 'completed', 'error'], 0), **by_status},
+        },
+        "line_items": {
+            "total": scored,
+            "average_confidence": round(score_sum / scored, 2) if scored else None,
+            "confidence": [
+                {
+                    "min": b * CONFIDENCE_BUCKET_WIDTH,
+                    "max": (b + 1) * CONFIDENCE_BUCKET_WIDTH,
+                    "count": buckets.get(b, (0, 0))[0],
+                }
+                for b in range(CONFIDENCE_BUCKETS)
+            ],
+        },
+        "recent_orders": [events.order_to_dict(order) for order in recent],
+    }
@@ -0,0 +1,37 @@
+import { useEffect, useRef } from 'react';
+import { API_BASE_URL } from '../utils/constants';
+
+export type OrderEventType = 'order' | 'order_deleted' | 'line_items' | 'line_item' | 'reset';
+
+export interface OrderEvent {
+  type: OrderEventType;
+  data: any;
+}
+
+const EVENT_TYPES: OrderEventType[] = ['order', 'order_deleted', 'line_items', 'line_item', 'reset'];
+
+// Subscribe to server-pushed order changes, optionally for a single order.
+// EventSource reconnects on its own and resumes from the last event it received.
+export function useOrderEvents(onEvent: (event: OrderEvent) => void, orderId?: number, enabled = true) {
+  const handlerRef = useRef(onEvent);
+  handlerRef.current = onEvent;
+
+  useEffect(() => {
+    if (!enabled) return;
+
+    const query = orderId !== undefined ? `?order_id=${orderId}` : '';
+    const source = new EventSource(`${API_BASE_URL}/orders/events${query}`);
+    const listeners = EVENT_TYPES.map(type => {
+      const listener = (message: MessageEvent) => {
+        handlerRef.current({ type, data: JSON.parse(message.data) });
+      };
+      source.addEventListener(type, listener);
+      return listener;
+    });
+
+    return () => {
+      EVENT_TYPES.forEach((type, i) => source.removeEventListener(type, listeners[i]));
+      source.close();
+    };
+  }, [orderId, enabled]);
+}
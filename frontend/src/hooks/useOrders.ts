@@ -1,5 +1,6 @@
 import { useState, useEffect, useCallback } from 'react';
 import { API_BASE_URL } from '../utils/constants';
+import { useOrderEvents, OrderEvent } from './useOrderEvents';
 
 export interface LineItem {
   id: number;
@@ -17,13 +18,19 @@ export interface Order {
   updated_at: string;
 }
 
+export interface OrderPage {
+  orders: Order[];
+  next_cursor: string | null;
+}
+
 export interface OrderDetails {
   order: Order;
   line_items: LineItem[];
 }
 
-export function useOrders() {
+export function useOrders({ live = false }: { live?: boolean } = {}) {
   const [orders, setOrders] = useState<Order[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
@@ -32,8 +39,9 @@ export function useOrders() {
       setLoading(true);
       const response = await fetch(`${API_BASE_URL}/orders`);
       if (!response.ok) throw new Error('Failed to fetch orders');
-      const data = await response.json();
-      setOrders(data);
+      const data: OrderPage = await response.json();
+      setOrders(data.orders);
+      setNextCursor(data.next_cursor);
       setError(null);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'An error occurred');
@@ -42,6 +50,20 @@ export function useOrders() {
     }
   }, []);
 
+  const loadMoreOrders = useCallback(async () => {
+    if (!nextCursor) return;
+    try {
+      const response = await fetch(`${API_BASE_URL}/orders?cursor=${encodeURIComponent(nextCursor)}`);
+      if (!response.ok) throw new Error('Failed to fetch orders');
+      const data: OrderPage = await response.json();
+      setOrders(orders => [...orders, ...data.orders]);
+      setNextCursor(data.next_cursor);
+      setError(null);
+    } catch (err) {
+      setError(err instanceof Error ? err.message : 'An error occurred');
+    }
+  }, [nextCursor]);
+
   const getOrderDetails = useCallback(async (orderId: number): Promise<OrderDetails> => {
     const response = await fetch(`${API_BASE_URL}/orders/${orderId}`);
     if (!response.ok) throw new Error('Failed to fetch order details');
@@ -104,6 +126,31 @@ export function useOrders() {
     return updatedOrder;
   }, []);
 
+  // Keep the loaded orders in sync with server-pushed changes
+  const applyOrderEvent = useCallback((event: OrderEvent) => {
+    switch (event.type) {
+      case 'order': {
+        const order: Order = event.data;
+        setOrders(orders => {
+          if (orders.some(o => o.id === order.id)) {
+            return orders.map(o => (o.id === order.id ? order : o));
+          }
+          // Only new orders belong on the loaded pages; older ones show up when paging
+          return orders.length === 0 || order.created_at >= orders[0].created_at ? [order, ...orders] : orders;
+        });
+        break;
+      }
+      case 'order_deleted':
+        setOrders(orders => orders.filter(o => o.id !== event.data.id));
+        break;
+      case 'reset':
+        fetchOrders();
+        break;
+    }
+  }, [fetchOrders]);
+
+  useOrderEvents(applyOrderEvent, undefined, live);
+
   useEffect(() => {
     fetchOrders();
   }, [fetchOrders]);
@@ -113,6 +160,8 @@ export function useOrders() {
     loading,
     error,
     fetchOrders,
+    hasMoreOrders: nextCursor !== null,
+    loadMoreOrders,
     getOrderDetails,
     updateLineItem,
     exportOrder,
@@ -0,0 +1,63 @@
+import { useState, useEffect, useCallback, useRef } from 'react';
+import { API_BASE_URL } from '../utils/constants';
+import { Order } from './useOrders';
+import { useOrderEvents } from './useOrderEvents';
+
+export interface ConfidenceBucket {
+  min: number;
+  max: number;
+  count: number;
+}
+
+export interface DashboardStats {
+  orders: {
+    total: number;
+    by_status: Record<Order['status'], number>;
+  };
+  line_items: {
+    total: number;
+    average_confidence: number | null;
+    confidence: ConfidenceBucket[];
+  };
+  recent_orders: Order[];
+}
+
+// Coalesce bursts of order events (e.g. a batch upload) into one refresh
+const REFRESH_DELAY_MS = 300;
+
+export function useStats() {
+  const [stats, setStats] = useState<DashboardStats | null>(null);
+  const [loading, setLoading] = useState(true);
+  const [error, setError] = useState<string | null>(null);
+  const refreshTimer = useRef<ReturnType<typeof setTimeout> | null>(null);
+
+  const fetchStats = useCallback(async () => {
+    try {
+      const response = await fetch(`${API_BASE_URL}/stats`);
+      if (!response.ok) throw new Error('Failed to fetch stats');
+      setStats(await response.json());
+      setError(null);
+    } catch (err) {
+      setError(err instanceof Error ? err.message : 'An error occurred');
+    } finally {
+      setLoading(false);
+    }
+  }, []);
+
+  useOrderEvents(() => {
+    if (refreshTimer.current) return;
+    refreshTimer.current = setTimeout(() => {
+      refreshTimer.current = null;
+      fetchStats();
+    }, REFRESH_DELAY_MS);
+  });
+
+  useEffect(() => {
+    fetchStats();
+    return () => {
+      if (refreshTimer.current) clearTimeout(refreshTimer.current);
+    };
+  }, [fetchStats]);
+
+  return { stats, loading, error, fetchStats };
+}
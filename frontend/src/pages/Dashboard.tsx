@@ -1,6 +1,7 @@
 import { Link } from 'react-router-dom';
 import { Card, CardHeader, CardTitle, CardDescription, CardContent } from '../components/Card';
-import { useOrders, Order } from '../hooks/useOrders';
+import { Order } from '../hooks/useOrders';
+import { useStats } from '../hooks/useStats';
 
 function StatusBadge({ status }: { status: Order['status'] }) {
   const colors = {
@@ -18,29 +19,32 @@ function StatusBadge({ status }: { status: Order['status'] }) {
 }
 
 export function Dashboard() {
-  const { orders, loading, error } = useOrders();
-
-  const stats = {
-    total: orders.length,
-    pending: orders.filter(o => o.status === 'needs_review').length,
-    processing: orders.filter(o => o.status === 'processing').length,
-    completed: orders.filter(o => o.status === 'completed').length,
-  };
+  const { stats: dashboardStats, loading, error } = useStats();
 
   if (loading) {
     return <div>Loading...</div>;
   }
 
-  if (error) {
+  if (error || !dashboardStats) {
     return (
       <Card variant="error">
         <CardContent className="p-6">
-          <p className="text-error-500">{error}</p>
+          <p className="text-error-500">{error || 'Failed to load stats'}</p>
         </CardContent>
       </Card>
     );
   }
 
+  const stats = {
+    total: dashboardStats.orders.total,
+    pending: dashboardStats.orders.by_status.needs_review,
+    processing: dashboardStats.orders.by_status.processing,
+    completed: dashboardStats.orders.by_status.completed,
+  };
+  const orders = dashboardStats.recent_orders;
+  const confidence = dashboardStats.line_items;
+  const largestBucket = Math.max(1, ...confidence.confidence.map(b => b.count));
+
   return (
     <div className="space-y-6">
       <div>
@@ -104,7 +108,7 @@ export function Dashboard() {
             </div>
           ) : (
             <div className="divide-y divide-neutral-200">
-              {orders.slice(0, 5).map((order) => (
+              {orders.map((order) => (
                 <Link
                   key={order.id}
                   to={`/orders/${order.id}`}
@@ -125,6 +129,33 @@ export function Dashboard() {
           )}
         </CardContent>
       </Card>
+
+      <Card>
+        <CardHeader>
+          <CardTitle>Match Confidence</CardTitle>
+          <CardDescription>
+            {confidence.average_confidence === null
+              ? 'No line items matched yet'
+              : `${confidence.total} line items, average ${confidence.average_confidence.toFixed(1)}%`}
+          </CardDescription>
+        </CardHeader>
+        <CardContent>
+          <div className="space-y-2">
+            {confidence.confidence.map((bucket) => (
+              <div key={bucket.min} className="flex items-center space-x-4 text-sm">
+                <span className="w-20 text-neutral-500">{bucket.min}-{bucket.max}%</span>
+                <div className="flex-1 h-2 rounded-full bg-neutral-100">
+                  <div
+                    className="h-2 rounded-full bg-primary-500"
+                    style={{ width: `${(bucket.count / largestBucket) * 100}%` }}
+                  />
+                </div>
+                <span className="w-16 text-right text-neutral-700">{bucket.count}</span>
+              </div>
+            ))}
+          </div>
+        </CardContent>
+      </Card>
     </div>
   );
 } 
\ No newline at end of file
@@ -3,6 +3,7 @@ import { useParams, useNavigate } from 'react-router-dom';
 import { Card, CardHeader, CardTitle, CardDescription, CardContent } from '../components/Card';
 import { Button } from '../components/Button';
 import { useOrders, OrderDetails as IOrderDetails } from '../hooks/useOrders';
+import { useOrderEvents } from '../hooks/useOrderEvents';
 import { EditMatchModal } from '../components/EditMatchModal';
 import { StatusBadge } from '../components/StatusBadge';
 import { Toast } from '../components/Toast';
@@ -54,6 +55,22 @@ export function OrderDetails() {
     }
   }, [orderId, getOrderDetails]);
 
+  // Apply pushed updates instead of re-fetching the order on a timer
+  useOrderEvents((event) => {
+    if (event.type === 'order') {
+      setOrderDetails(prev => prev ? { ...prev, order: event.data } : prev);
+    } else if (event.type === 'line_item') {
+      setOrderDetails(prev => prev ? {
+        ...prev,
+        line_items: prev.line_items.map(item => (item.id === event.data.id ? { ...item, ...event.data } : item)),
+      } : prev);
+    } else if (event.type === 'line_items' || event.type === 'reset') {
+      getOrderDetails(Number(orderId))
+        .then(setOrderDetails)
+        .catch(err => setError(err instanceof Error ? err.message : 'An error occurred'));
+    }
+  }, Number(orderId), !!orderId);
+
   const handleExport = async () => {
     if (!orderId) return;
     
@@ -1,5 +1,6 @@
 import { Link } from 'react-router-dom';
 import { Card, CardHeader, CardTitle, CardDescription, CardContent } from '../components/Card';
+import { Button } from '../components/Button';
 import { useOrders, Order } from '../hooks/useOrders';
 
 function StatusBadge({ status }: { status: Order['status'] }) {
@@ -18,7 +19,7 @@ function StatusBadge({ status }: { status: Order['status'] }) {
 }
 
 export function Orders() {
-  const { orders, loading, error } = useOrders();
+  const { orders, loading, error, hasMoreOrders, loadMoreOrders } = useOrders({ live: true });
 
   if (loading) {
     return (
@@ -78,6 +79,13 @@ export function Orders() {
               ))}
             </div>
           )}
+          {hasMoreOrders && (
+            <div className="pt-4 text-center">
+              <Button variant="secondary" onClick={loadMoreOrders}>
+                Load more
+              </Button>
+            </div>
+          )}
         </CardContent>
       </Card>
     </div>